@@ -0,0 +1,25 @@
+# banco_sqlite.py
+
+import sqlite3
+from contextlib import contextmanager
+
+# Formato das datas gravadas nos bancos (o mesmo das planilhas e do JSON antigos)
+FORMATO_DATA = '%d/%m/%Y %H:%M:%S'
+
+def conectar(caminho, **opcoes):
+    """
+    Abre o banco sem transações implícitas (isolation_level=None): toda escrita passa por
+    transacao(), que abre a transação explicitamente com BEGIN IMMEDIATE.
+    """
+    return sqlite3.connect(caminho, timeout=10, isolation_level=None, **opcoes)
+
+@contextmanager
+def transacao(conn):
+    """Transação de escrita (BEGIN IMMEDIATE): confirma ao sair do bloco ou desfaz em caso de erro."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
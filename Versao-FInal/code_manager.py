@@ -1,77 +1,604 @@
 # code_manager.py
 
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime
-from openpyxl import load_workbook, Workbook
 from PyQt5.QtWidgets import QMessageBox
 
+from banco_sqlite import FORMATO_DATA, conectar, transacao
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Colunas da planilha antiga (e da exportação para Excel)
+COLUNA_CODIGO = 'Codigo Unico'
+COLUNA_DATA = 'Data de Registro'
+COLUNA_PROJETO = 'Projeto'
+COLUNA_LIBERADO = 'Liberado em'
+
+# Data gravada em 'registrado_em': ordenável como texto, usada nas buscas por período
+FORMATO_ISO = '%Y-%m-%d %H:%M:%S'
+GLOB_DATA = '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+
+# Código no formato <prefixo><número>, ex.: DES123
+PADRAO_CODIGO = re.compile(r'^([A-Za-z]+)(\d+)$')
+
+def _separar_codigo(codigo):
+    """('DES', 123) para 'DES123'; ('', None) para códigos fora do padrão, que não entram em nenhuma sequência."""
+    match = PADRAO_CODIGO.match(codigo)
+    if not match:
+        return '', None
+    return match.group(1).upper(), int(match.group(2))
+
+def _data_iso(data_registro):
+    """'18/10/2026 14:30:00' -> '2026-10-18 14:30:00'; '' se não for uma data reconhecida."""
+    texto = str(data_registro or '').strip()
+    for leitor in (lambda t: datetime.strptime(t, FORMATO_DATA), datetime.fromisoformat):
+        try:
+            return leitor(texto).strftime(FORMATO_ISO)
+        except ValueError:
+            pass
+    return ''
+
+def _limite_periodo(data, fim=False):
+    """Limite da busca por período; uma data sem horário cobre o dia inteiro."""
+    if not isinstance(data, datetime):
+        data = datetime(data.year, data.month, data.day, *((23, 59, 59) if fim else (0, 0, 0)))
+    return data.strftime(FORMATO_ISO)
+
+# ======================================================================
+# Trava entre processos (inclusive de outras estações, em pasta de rede)
+# ======================================================================
+
+# Variáveis de ambiente para usar um banco compartilhado sem alterar a interface
+ENV_BANCO_CODIGOS = "GERADOR_CODIGOS_DB"
+ENV_LOTE_CODIGOS = "GERADOR_CODIGOS_LOTE"
+
+# Tempo máximo de espera pela trava do banco (segundos)
+TEMPO_TRAVA = 15
+INTERVALO_TRAVA = 0.05
+
+def _tentar_travar(arquivo):
+    if fcntl is not None:
+        # lockf (travas POSIX) também vale em compartilhamentos NFS/SMB montados
+        fcntl.lockf(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+
+def _destravar(arquivo):
+    if fcntl is not None:
+        fcntl.lockf(arquivo, fcntl.LOCK_UN)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def trava_arquivo(caminho, tempo_maximo=TEMPO_TRAVA):
+    """
+    Trava exclusiva no arquivo 'caminho' (criado se não existir), compartilhada entre
+    processos e máquinas. Espera até 'tempo_maximo' segundos e levanta TimeoutError.
+    """
+    with open(caminho, 'a+b') as arquivo:
+        limite = time.monotonic() + tempo_maximo
+        while True:
+            try:
+                _tentar_travar(arquivo)
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"O arquivo '{caminho}' continua travado por outro processo.")
+                time.sleep(INTERVALO_TRAVA)
+        try:
+            yield
+        finally:
+            _destravar(arquivo)
+
 class CodeGenerator:
     """
     Gerencia a criação e persistência de códigos únicos para as peças.
-    Interage com uma planilha Excel como banco de dados.
+    Os códigos ficam em um banco SQLite, com o código indexado como único e uma
+    sequência por prefixo (o último número emitido), atualizada a cada reserva;
+    na primeira abertura, a planilha Excel antiga é importada.
+
+    Toda escrita no banco acontece sob uma trava de arquivo ('<banco>.lock'), o que
+    permite várias estações usarem o mesmo banco numa pasta de rede. Com 'lease_size'
+    maior que zero, cada estação reserva blocos de números de uma vez (concessões) e
+    emite os códigos a partir de um arquivo local, gravando-os no banco compartilhado
+    só quando o bloco acaba ou na hora de fechar (close).
     """
-    def __init__(self, db_path="codigo_database.xlsx"):
-        self.db_path = db_path
-        self.code_column_name = 'Codigo Unico'
-        self.timestamp_column_name = 'Data de Registro'
-        self.project_column_name = 'Projeto'
-        self.existing_codes = set()
-        self.last_code_number = 0
-        self._load_database()
-
-    def _load_database(self):
+    def __init__(self, db_path=None, legacy_xlsx_path=None, lease_size=None, station=None, lease_dir=None, shared=None):
+        # Sem caminho explícito, o banco pode vir da variável de ambiente (banco compartilhado)
+        env_db = os.environ.get(ENV_BANCO_CODIGOS, "").strip()
+        self.db_path = db_path or env_db or "codigo_database.db"
+        # Em pasta de rede o modo WAL não é seguro (memória compartilhada só vale numa máquina)
+        self.shared = bool(env_db and not db_path) if shared is None else shared
+        if legacy_xlsx_path is None:
+            legacy_xlsx_path = os.path.join(os.path.dirname(self.db_path), "codigo_database.xlsx")
+        self.legacy_xlsx_path = legacy_xlsx_path
+        if lease_size is None:
+            valor = os.environ.get(ENV_LOTE_CODIGOS, "").strip()
+            try:
+                lease_size = int(valor or 0)
+            except ValueError:
+                print(f"{ENV_LOTE_CODIGOS}='{valor}' não é um número inteiro; as concessões ficam desligadas.")
+                lease_size = 0
+        self.lease_size = max(0, lease_size)
+        self.station = station or socket.gethostname()
+        self.lease_dir = lease_dir or os.path.join(os.path.expanduser("~"), ".gerador_desenhos")
+        self.lock_path = self.db_path + ".lock"
+        self.lease_path = None
+        self.code_column_name = COLUNA_CODIGO
+        self.timestamp_column_name = COLUNA_DATA
+        self.project_column_name = COLUNA_PROJETO
+        self.conn = None
+        # A conexão é usada também pela thread de pré-reserva (CodePrefetcher); esta trava serializa o acesso
+        self._db_lock = threading.RLock()
         try:
-            df = pd.read_excel(self.db_path)
+            self._open_database()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            # Conexão aberta pela metade não é usada: as chamadas seguintes tratam o banco como indisponível
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            self.lease_path = None
+            QMessageBox.warning(None, "Erro de Leitura", f"Não foi possível abrir o banco de dados de códigos: {e}")
+
+    def _open_database(self):
+        self.conn = conectar(self.db_path, check_same_thread=False)
+        with trava_arquivo(self.lock_path):
+            self._prepare_database()
+        if self.lease_size:
+            banco = self.conn.execute("SELECT valor FROM meta WHERE chave = 'id_banco'").fetchone()[0]
+            # Um arquivo de concessão por estação e por banco
+            self.lease_path = os.path.join(self.lease_dir, f"concessao_{self.station}_{banco[:8]}.json")
+            # Códigos emitidos numa sessão que não fechou direito entram no banco agora
+            self.sync_lease()
+
+    def _prepare_database(self):
+        self.conn.execute("PRAGMA journal_mode=DELETE" if self.shared else "PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL" if self.shared else "PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS codigos (
+                codigo TEXT NOT NULL UNIQUE,
+                data_registro TEXT,
+                projeto TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sequencias (
+                prefixo TEXT PRIMARY KEY,
+                ultimo INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+            CREATE TABLE IF NOT EXISTS concessoes (
+                estacao TEXT NOT NULL,
+                prefixo TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                fim INTEGER NOT NULL,
+                data_registro TEXT
+            );
+        """)
+        self.conn.execute("INSERT OR IGNORE INTO meta (chave, valor) VALUES ('id_banco', ?)", (uuid.uuid4().hex,))
+        self._migrate_schema()
+        self._import_legacy_xlsx()
+        self._check_sequences()
+
+    def _migrate_schema(self):
+        """
+        Bancos criados antes das colunas 'prefixo'/'numero'/'registrado_em'/'liberado_em' ganham as colunas e
+        os índices. O prefixo e o número das linhas antigas são preenchidos por _check_sequences;
+        a data ISO é preenchida aqui, só para as linhas que ainda não a têm.
+        """
+        colunas = {linha[1] for linha in self.conn.execute("PRAGMA table_info(codigos)")}
+        with transacao(self.conn):
+            if 'prefixo' not in colunas:
+                self.conn.execute("ALTER TABLE codigos ADD COLUMN prefixo TEXT")
+            if 'numero' not in colunas:
+                self.conn.execute("ALTER TABLE codigos ADD COLUMN numero INTEGER")
+            if 'registrado_em' not in colunas:
+                self.conn.execute("ALTER TABLE codigos ADD COLUMN registrado_em TEXT")
+            if 'liberado_em' not in colunas:
+                # Data em que um código reservado e não usado foi liberado (NULL = código em uso)
+                self.conn.execute("ALTER TABLE codigos ADD COLUMN liberado_em TEXT")
+            # Índice que responde "maior número do prefixo" (e a busca por código) sem percorrer a tabela
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_codigos_prefixo_numero ON codigos (prefixo, numero)")
+            # Índices das buscas por projeto e por período
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_codigos_projeto ON codigos (projeto, registrado_em)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_codigos_registrado_em ON codigos (registrado_em)")
+            # Datas no formato padrão (dd/mm/aaaa hh:mm:ss) são convertidas direto no SQL; o resto, uma a uma
+            self.conn.execute("UPDATE codigos SET registrado_em = substr(data_registro, 7, 4) || '-' || substr(data_registro, 4, 2) "
+                              "|| '-' || substr(data_registro, 1, 2) || substr(data_registro, 11) "
+                              "WHERE registrado_em IS NULL AND data_registro GLOB ?", (GLOB_DATA,))
+            sem_data = self.conn.execute("SELECT rowid, data_registro FROM codigos WHERE registrado_em IS NULL").fetchall()
+            self.conn.executemany("UPDATE codigos SET registrado_em = ? WHERE rowid = ?",
+                                  [(_data_iso(data), rowid) for rowid, data in sem_data])
+
+    def _check_sequences(self):
+        """
+        Confere a sequência gravada de cada prefixo contra o maior número cadastrado
+        (uma consulta no índice por prefixo, custo independente da quantidade de códigos).
+        Se algum código tiver número acima da sequência (inserido por fora do programa,
+        ou sequência perdida), a sequência é reconstruída a partir dos dados.
+        Uma sequência acima do maior código é mantida: números de códigos apagados não são reutilizados.
+        """
+        with transacao(self.conn):
+            # Só linhas ainda sem prefixo (inseridas por fora ou de antes da migração) são analisadas
+            pendentes = self.conn.execute("SELECT rowid, codigo FROM codigos WHERE prefixo IS NULL").fetchall()
+            if pendentes:
+                self.conn.executemany("UPDATE codigos SET prefixo = ?, numero = ? WHERE rowid = ?",
+                                      [(*_separar_codigo(codigo), rowid) for rowid, codigo in pendentes])
+            prefixos = [linha[0] for linha in self.conn.execute("SELECT prefixo FROM sequencias")]
+            prefixos += sorted({_separar_codigo(codigo)[0] for _, codigo in pendentes} - set(prefixos) - {''})
+            divergentes = [prefixo for prefixo in prefixos if self._maior_numero(prefixo) > self._ultimo(prefixo)]
+            if divergentes:
+                self._rebuild_sequences(divergentes)
+        if divergentes:
+            print(f"Sequência de códigos reconstruída a partir do banco para: {', '.join(divergentes)}.")
+
+    def _maior_numero(self, prefixo):
+        return self.conn.execute("SELECT MAX(numero) FROM codigos WHERE prefixo = ?", (prefixo,)).fetchone()[0] or 0
+
+    def _ultimo(self, prefixo):
+        linha = self.conn.execute("SELECT ultimo FROM sequencias WHERE prefixo = ?", (prefixo,)).fetchone()
+        return linha[0] if linha else 0
+
+    def _rebuild_sequences(self, prefixos):
+        """Leva a sequência de cada prefixo ao maior número cadastrado (deve rodar dentro de uma transação)."""
+        self.conn.executemany("INSERT INTO sequencias (prefixo, ultimo) VALUES (?, ?) "
+                              "ON CONFLICT(prefixo) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)",
+                              [(prefixo, self._maior_numero(prefixo)) for prefixo in prefixos])
+
+    def _import_legacy_xlsx(self):
+        """Importa a planilha antiga uma única vez; depois disso o Excel deixa de ser lido."""
+        if self.conn.execute("SELECT 1 FROM meta WHERE chave = 'importado_xlsx'").fetchone():
+            return
+        linhas = []
+        if self.legacy_xlsx_path and os.path.exists(self.legacy_xlsx_path):
+            df = pd.read_excel(self.legacy_xlsx_path, dtype=str)
             if self.code_column_name in df.columns:
-                df[self.code_column_name] = df[self.code_column_name].astype(str)
-                self.existing_codes = set(df[self.code_column_name].tolist())
-                max_num = 0
-                for code in self.existing_codes:
-                    if code.upper().startswith('DES'):
-                        try:
-                            num = int(code[3:])
-                            if num > max_num: max_num = num
-                        except (ValueError, TypeError): continue
-                self.last_code_number = max_num
-        except FileNotFoundError:
-            print(f"Arquivo '{self.db_path}' não encontrado. Um novo será criado.")
-        except Exception as e:
-            QMessageBox.warning(None, "Erro de Leitura", f"Não foi possível ler o banco de dados de códigos: {e}")
-
-    def _append_to_database(self, new_code, project_number):
-        timestamp = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-        new_row = [new_code, timestamp, project_number]
-        try:
-            wb = load_workbook(self.db_path)
-            sheet = wb.active
-        except FileNotFoundError:
-            wb = Workbook()
-            sheet = wb.active
-            sheet.append([self.code_column_name, self.timestamp_column_name, self.project_column_name])
-        
-        sheet.append(new_row)
-        
+                df = df.dropna(subset=[self.code_column_name])
+                for col in (self.timestamp_column_name, self.project_column_name):
+                    if col not in df.columns: df[col] = None
+                df = df.astype(object).where(df.notna(), None)
+                linhas = list(zip(df[self.code_column_name].str.strip(), df[self.timestamp_column_name], df[self.project_column_name]))
+
+        with transacao(self.conn):
+            self.conn.executemany("INSERT OR IGNORE INTO codigos (codigo, data_registro, projeto, prefixo, numero, registrado_em) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(codigo, data, projeto, *_separar_codigo(codigo), _data_iso(data)) for codigo, data, projeto in linhas])
+            # A sequência de cada prefixo começa no maior número já usado
+            prefixos = {_separar_codigo(codigo)[0] for codigo, _, _ in linhas} - {''}
+            self._rebuild_sequences(sorted(prefixos))
+            self.conn.execute("INSERT INTO meta (chave, valor) VALUES ('importado_xlsx', ?)", (datetime.now().strftime(FORMATO_DATA),))
+        if linhas:
+            print(f"{len(linhas)} código(s) importado(s) de '{self.legacy_xlsx_path}' para '{self.db_path}'.")
+
+    def generate_new_code(self, project_number, prefix='DES'):
+        codes = self.reserve_codes(project_number, 1, prefix)
+        return codes[0] if codes else None
+
+    def reserve_codes(self, project_number, quantity, prefix='DES'):
+        """
+        Reserva 'quantity' códigos seguidos para o projeto em uma única transação
+        (ou, com concessões, a partir do bloco local desta estação).
+        Retorna a lista de códigos ou None em caso de erro.
+        """
+        if self.conn is None:
+            QMessageBox.critical(None, "Erro ao Salvar", f"O banco de códigos '{self.db_path}' não está disponível.")
+            return None
         try:
-            wb.save(self.db_path)
-        except PermissionError:
-             QMessageBox.critical(None, "Erro de Permissão", f"Não foi possível salvar o novo código em '{self.db_path}'.\n\nPor favor, feche a planilha e tente novamente.")
-             return False
-        except Exception as e:
+            return self.allocate_codes(project_number, quantity, prefix)
+        except TimeoutError as e:
+            QMessageBox.critical(None, "Erro ao Salvar", f"O banco de códigos está em uso por outra estação. Tente novamente.\n\n{e}")
+        except sqlite3.OperationalError as e:
+            QMessageBox.critical(None, "Erro ao Salvar", f"Não foi possível salvar os novos códigos em '{self.db_path}'.\n\n"
+                                 f"O banco pode estar em uso por outro programa. Tente novamente.\n\n{e}")
+        except sqlite3.Error as e:
             QMessageBox.critical(None, "Erro ao Salvar", f"Ocorreu um erro ao salvar o banco de códigos: {e}")
-            return False
-        return True
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(None, "Erro ao Salvar", f"Não foi possível usar o arquivo de concessão '{self.lease_path}': {e}")
+        return None
 
-    def generate_new_code(self, project_number, prefix='DES'):
-        self._load_database()
-        current_number = self.last_code_number + 1
-        new_code = f"{prefix}{current_number}"
-        while new_code in self.existing_codes:
-            current_number += 1
-            new_code = f"{prefix}{current_number}"
-        
-        if self._append_to_database(new_code, project_number):
-            self.existing_codes.add(new_code)
-            self.last_code_number = current_number
-            return new_code
-        else:
-            return None
\ No newline at end of file
+    def allocate_codes(self, project_number, quantity, prefix='DES'):
+        """
+        Mesmo que reserve_codes, mas levanta as exceções (TimeoutError, sqlite3.Error, OSError,
+        ValueError) em vez de mostrar mensagens; para uso fora da thread da interface.
+        """
+        if self.conn is None:
+            raise sqlite3.OperationalError(f"O banco de códigos '{self.db_path}' não está disponível.")
+        if quantity <= 0:
+            return []
+        timestamp = datetime.now().strftime(FORMATO_DATA)
+        with self._db_lock:
+            if self.lease_size:
+                return self._reserve_from_lease(project_number, quantity, prefix, timestamp)
+            with trava_arquivo(self.lock_path), transacao(self.conn):
+                numeros = self._allocate_numbers(prefix.upper(), quantity)
+                codes = [f"{prefix}{numero}" for numero in numeros]
+                self.conn.executemany("INSERT INTO codigos (codigo, data_registro, projeto, prefixo, numero, registrado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                                      [(code, timestamp, str(project_number), prefix.upper(), numero, _data_iso(timestamp))
+                                       for code, numero in zip(codes, numeros)])
+                return codes
+
+    def release_codes(self, codes):
+        """
+        Marca como liberados os códigos reservados que não chegaram a ser usados. Eles continuam
+        no banco (com a data em 'liberado_em') e seus números ficam como lacuna: números de
+        códigos liberados nunca são emitidos de novo. Com concessão, os pendentes são gravados antes.
+        """
+        if not codes or self.conn is None:
+            return
+        with self._db_lock:
+            if self.lease_size:
+                self.sync_lease()
+            agora = datetime.now().strftime(FORMATO_DATA)
+            with trava_arquivo(self.lock_path), transacao(self.conn):
+                self.conn.executemany("UPDATE codigos SET liberado_em = ? WHERE codigo = ? AND liberado_em IS NULL",
+                                      [(agora, code) for code in codes])
+
+    def _allocate_numbers(self, prefixo, quantidade):
+        """
+        Avança a sequência do prefixo em 'quantidade' números e os devolve (dentro da transação).
+        A sequência parte do maior entre o valor gravado e o maior número cadastrado (índice),
+        então nenhum número já usado é emitido de novo.
+        """
+        inicio = max(self._ultimo(prefixo), self._maior_numero(prefixo)) + 1
+        fim = inicio + quantidade - 1
+        self.conn.execute("INSERT INTO sequencias (prefixo, ultimo) VALUES (?, ?) "
+                          "ON CONFLICT(prefixo) DO UPDATE SET ultimo = excluded.ultimo", (prefixo, fim))
+        return list(range(inicio, fim + 1))
+
+    # ==================================================================
+    # Concessões: blocos de números reservados por estação
+    # ==================================================================
+
+    def _load_lease(self):
+        if not os.path.exists(self.lease_path):
+            return {'livres': {}, 'pendentes': []}
+        with open(self.lease_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_lease(self, concessao):
+        # Grava num temporário e troca, para nunca deixar o arquivo pela metade
+        temporario = self.lease_path + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(concessao, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.lease_path)
+
+    def _reserve_from_lease(self, project_number, quantity, prefix, timestamp):
+        """
+        Emite os códigos do bloco local da estação; só quando o bloco não basta o banco
+        compartilhado é acessado, para gravar os pendentes e conceder um bloco novo.
+        A trava local protege o arquivo quando há mais de um programa aberto na mesma estação.
+        """
+        os.makedirs(self.lease_dir, exist_ok=True)
+        prefixo = prefix.upper()
+        with trava_arquivo(self.lease_path + ".lock"):
+            concessao = self._load_lease()
+            proximo, fim = concessao['livres'].get(prefixo, (1, 0))
+            numeros = list(range(proximo, min(fim, proximo + quantity - 1) + 1))
+            if len(numeros) < quantity:
+                with trava_arquivo(self.lock_path), transacao(self.conn):
+                    self._flush_pending(concessao['pendentes'])
+                    bloco = self._allocate_numbers(prefixo, quantity - len(numeros) + self.lease_size)
+                    self.conn.execute("INSERT INTO concessoes (estacao, prefixo, inicio, fim, data_registro) VALUES (?, ?, ?, ?, ?)",
+                                      (self.station, prefixo, bloco[0], bloco[-1], timestamp))
+                concessao['pendentes'] = []
+                fim = bloco[-1]
+                numeros += bloco[:quantity - len(numeros)]
+            concessao['livres'][prefixo] = (numeros[-1] + 1, fim)
+            codes = [f"{prefix}{numero}" for numero in numeros]
+            concessao['pendentes'] += [(code, timestamp, str(project_number), prefixo, numero) for code, numero in zip(codes, numeros)]
+            self._save_lease(concessao)
+        return codes
+
+    def _flush_pending(self, pendentes):
+        """Grava no banco os códigos emitidos localmente (dentro da transação); repetir é inofensivo."""
+        self.conn.executemany("INSERT OR IGNORE INTO codigos (codigo, data_registro, projeto, prefixo, numero, registrado_em) "
+                              "VALUES (?, ?, ?, ?, ?, ?)", [(*registro, _data_iso(registro[1])) for registro in pendentes])
+
+    def sync_lease(self):
+        """Grava no banco compartilhado os códigos já emitidos pela concessão desta estação."""
+        if not self.lease_path or self.conn is None or not os.path.exists(self.lease_path):
+            return 0
+        with self._db_lock, trava_arquivo(self.lease_path + ".lock"):
+            concessao = self._load_lease()
+            pendentes = concessao['pendentes']
+            if not pendentes:
+                return 0
+            with trava_arquivo(self.lock_path), transacao(self.conn):
+                self._flush_pending(pendentes)
+            concessao['pendentes'] = []
+            self._save_lease(concessao)
+        return len(pendentes)
+
+    # ==================================================================
+    # Consultas: por código, por projeto e por período (todas por índice)
+    # ==================================================================
+
+    def search_codes(self, code=None, project=None, start=None, end=None, limit=None):
+        """
+        Busca no banco de códigos. Todos os filtros são opcionais e se somam:
+          - code: código exato, sem diferenciar maiúsculas ('des10423' acha 'DES10423');
+          - project: número do projeto (exato);
+          - start/end: datas (date ou datetime) do período de registro, ambas inclusivas.
+        Retorna um DataFrame com 'codigo', 'data_registro', 'projeto' e 'liberado_em' (None se o
+        código está em uso), do mais recente para o mais antigo, limitado a 'limit' linhas quando informado.
+        """
+        condicoes, parametros = [], []
+        if code:
+            prefixo, numero = _separar_codigo(code.strip())
+            if numero is not None:
+                condicoes.append("prefixo = ? AND numero = ?")
+                parametros += [prefixo, numero]
+            else:
+                condicoes.append("codigo = ?")
+                parametros.append(code.strip())
+        if project:
+            condicoes.append("projeto = ?")
+            parametros.append(str(project).strip())
+        if start is not None:
+            condicoes.append("registrado_em >= ?")
+            parametros.append(_limite_periodo(start))
+        if end is not None:
+            condicoes.append("registrado_em <= ?")
+            parametros.append(_limite_periodo(end, fim=True))
+        if start is not None or end is not None:
+            # Linhas sem data reconhecida ('') ficam fora das buscas por período
+            condicoes.append("registrado_em <> ''")
+        consulta = "SELECT codigo, data_registro, projeto, liberado_em FROM codigos"
+        if condicoes:
+            consulta += " WHERE " + " AND ".join(condicoes)
+        consulta += " ORDER BY registrado_em DESC, rowid DESC"
+        if limit:
+            consulta += f" LIMIT {int(limit)}"
+        # Códigos ainda pendentes na concessão desta estação também devem aparecer
+        self.sync_lease()
+        with self._db_lock:
+            return pd.read_sql_query(consulta, self.conn, params=parametros)
+
+    def lookup_code(self, code):
+        """Registro do código (dict com 'codigo', 'data_registro', 'projeto' e 'liberado_em') ou None se não existir."""
+        encontrados = self.search_codes(code=code, limit=1)
+        return encontrados.iloc[0].to_dict() if not encontrados.empty else None
+
+    def codes_for_project(self, project_number):
+        """Todos os códigos emitidos para o projeto, do mais recente para o mais antigo."""
+        return self.search_codes(project=project_number)
+
+    def export_to_xlsx(self, xlsx_path):
+        """Exporta todos os códigos para uma planilha com as colunas da planilha antiga, mais a data de liberação."""
+        self.sync_lease()
+        with self._db_lock:
+            df = pd.read_sql_query("SELECT codigo, data_registro, projeto, liberado_em FROM codigos ORDER BY rowid", self.conn)
+        df.columns = [self.code_column_name, self.timestamp_column_name, self.project_column_name, COLUNA_LIBERADO]
+        df.to_excel(xlsx_path, index=False)
+        return len(df)
+
+    def close(self):
+        """Fecha o banco; os códigos pendentes da concessão são gravados antes. Números livres continuam com a estação."""
+        if self.conn is not None:
+            try:
+                self.sync_lease()
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Códigos da concessão não gravados no banco (ficam para a próxima abertura): {e}")
+            with self._db_lock:
+                self.conn.close()
+                self.conn = None
+
+# ======================================================================
+# Pré-reserva de códigos em segundo plano
+# ======================================================================
+
+# Códigos mantidos reservados à frente para o projeto ativo
+ESTOQUE_PRE_RESERVA = 2
+# Espera (segundos) antes de tentar de novo quando o banco não responde
+INTERVALO_NOVA_TENTATIVA = 5
+# Espera máxima (segundos) pela thread ao fechar o programa
+TEMPO_PARADA = 1.0
+
+class CodePrefetcher:
+    """
+    Mantém alguns códigos já reservados para o projeto ativo, repostos por uma thread
+    em segundo plano, para que "Gerar Código" entregue um código sem esperar pelo banco.
+    Os códigos que sobram no estoque são marcados como liberados (release_codes) ao trocar
+    de projeto, ao concluí-lo ou ao fechar o programa (stop). A liberação também é feita pela
+    thread, para que a interface nunca espere pela trava do banco.
+    """
+    def __init__(self, generator, pool_size=ESTOQUE_PRE_RESERVA, prefix='DES'):
+        self.generator = generator
+        self.pool_size = pool_size
+        self.prefix = prefix
+        self.project_number = None
+        self.pool = []
+        self._liberar = []
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="pre-reserva-codigos", daemon=True)
+        self._thread.start()
+
+    def set_project(self, project_number):
+        """Passa a reservar para 'project_number' (None = nenhum projeto ativo); o estoque anterior é liberado pela thread."""
+        with self._cond:
+            self._liberar += self.pool
+            self.pool = []
+            self.project_number = project_number or None
+            self._cond.notify()
+
+    def take(self, project_number):
+        """Entrega na hora um código do estoque do projeto (None se estiver vazio) e pede a reposição."""
+        with self._cond:
+            if project_number != self.project_number or not self.pool:
+                return None
+            code = self.pool.pop(0)
+            self._cond.notify()
+        return code
+
+    def stop(self):
+        """
+        Pede à thread que libere os códigos não usados e encerre; deve ser chamado antes de
+        fechar o gerador. Espera no máximo TEMPO_PARADA para não segurar o fechamento da janela:
+        se o banco estiver lento, os códigos ficam sem 'liberado_em', apenas como emitidos
+        (seus números não voltam a ser usados de qualquer forma).
+        """
+        with self._cond:
+            self._stopping = True
+            self._liberar += self.pool
+            self.pool = []
+            self._cond.notify()
+        self._thread.join(TEMPO_PARADA)
+
+    def _release(self, codes):
+        try:
+            self.generator.release_codes(codes)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            # Sem a marca, os códigos só ficam como emitidos; nenhum número é reutilizado de qualquer forma
+            print(f"Não foi possível marcar como liberados os códigos pré-reservados {', '.join(codes)}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while (not self._stopping and not self._liberar
+                       and (self.project_number is None or len(self.pool) >= self.pool_size)):
+                    self._cond.wait()
+                sobras, self._liberar = self._liberar, []
+                stopping = self._stopping
+            if sobras:
+                self._release(sobras)
+            if stopping:
+                return
+            with self._cond:
+                if self._stopping or self.project_number is None or len(self.pool) >= self.pool_size:
+                    continue
+                project_number, falta = self.project_number, self.pool_size - len(self.pool)
+            try:
+                codes, erro = self.generator.allocate_codes(project_number, falta, self.prefix), None
+            except (sqlite3.Error, OSError, ValueError) as e:
+                codes, erro = [], e
+            with self._cond:
+                self.last_error = erro
+                # O projeto pode ter mudado (ou o programa fechado) durante a reserva
+                if project_number == self.project_number and not self._stopping:
+                    self.pool += codes
+                    codes = []
+                if erro is not None and not self._stopping:
+                    # Banco indisponível: tenta de novo mais tarde (o clique cai na reserva direta)
+                    self._cond.wait(INTERVALO_NOVA_TENTATIVA)
+            if codes:
+                self._release(codes)
@@ -0,0 +1,103 @@
+# code_search_dialog.py
+
+import time
+import pandas as pd
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox,
+                             QLineEdit, QDateEdit, QCheckBox, QPushButton, QLabel,
+                             QTableWidget, QTableWidgetItem, QMessageBox)
+from PyQt5.QtCore import QDate
+
+from code_manager import CodeGenerator
+
+# Máximo de linhas mostradas na tabela (a contagem avisa quando há mais)
+LIMITE_RESULTADOS = 5000
+
+class CodeSearchDialog(QDialog):
+    def __init__(self, code_generator: CodeGenerator, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Buscar Códigos")
+        self.code_generator = code_generator
+        self.setMinimumSize(700, 500)
+
+        layout = QVBoxLayout(self)
+
+        # Filtros
+        filters_group = QGroupBox("Filtros")
+        filters_layout = QFormLayout()
+        self.code_input = QLineEdit()
+        self.code_input.setPlaceholderText("Ex.: DES10423")
+        self.project_input = QLineEdit()
+        self.period_check = QCheckBox("Filtrar por período de registro")
+        self.start_date = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.end_date = QDateEdit(QDate.currentDate())
+        for date_edit in (self.start_date, self.end_date):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd/MM/yyyy")
+            date_edit.setEnabled(False)
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(self.start_date)
+        period_layout.addWidget(QLabel("até"))
+        period_layout.addWidget(self.end_date)
+        filters_layout.addRow("Código:", self.code_input)
+        filters_layout.addRow("Nº do Projeto:", self.project_input)
+        filters_layout.addRow(self.period_check)
+        filters_layout.addRow("Período:", period_layout)
+        filters_group.setLayout(filters_layout)
+
+        # Resultados
+        self.results_table = QTableWidget()
+        self.results_table.setColumnCount(4)
+        self.results_table.setHorizontalHeaderLabels(["Código", "Data de Registro", "Projeto", "Liberado em"])
+        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.status_label = QLabel("Informe um ou mais filtros e clique em Buscar.")
+
+        button_layout = QHBoxLayout()
+        self.search_btn = QPushButton("Buscar")
+        self.search_btn.setDefault(True)
+        close_btn = QPushButton("Fechar")
+        button_layout.addWidget(self.search_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+
+        layout.addWidget(filters_group)
+        layout.addWidget(self.results_table)
+        layout.addWidget(self.status_label)
+        layout.addLayout(button_layout)
+
+        # Conexões
+        self.period_check.toggled.connect(self.start_date.setEnabled)
+        self.period_check.toggled.connect(self.end_date.setEnabled)
+        self.code_input.returnPressed.connect(self.search)
+        self.project_input.returnPressed.connect(self.search)
+        self.search_btn.clicked.connect(self.search)
+        close_btn.clicked.connect(self.reject)
+
+    def search(self):
+        code = self.code_input.text().strip()
+        project = self.project_input.text().strip()
+        use_period = self.period_check.isChecked()
+        if not (code or project or use_period):
+            QMessageBox.warning(self, "Buscar Códigos", "Informe o código, o projeto ou o período."); return
+        start = self.start_date.date().toPyDate() if use_period else None
+        end = self.end_date.date().toPyDate() if use_period else None
+        inicio = time.perf_counter()
+        try:
+            # Uma linha a mais que o limite só para saber se a lista foi cortada
+            results = self.code_generator.search_codes(code=code, project=project, start=start, end=end, limit=LIMITE_RESULTADOS + 1)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Busca", f"Não foi possível consultar o banco de códigos: {e}"); return
+        duracao = (time.perf_counter() - inicio) * 1000
+        cortada = len(results) > LIMITE_RESULTADOS
+        results = results.head(LIMITE_RESULTADOS)
+
+        self.results_table.setRowCount(len(results))
+        for i, row in enumerate(results.itertuples(index=False)):
+            for j, value in enumerate(row):
+                self.results_table.setItem(i, j, QTableWidgetItem('-' if pd.isna(value) else str(value)))
+        self.results_table.resizeColumnsToContents()
+
+        if results.empty:
+            self.status_label.setText(f"Nenhum código encontrado ({duracao:.0f} ms).")
+        else:
+            aviso = f" (mostrando os {LIMITE_RESULTADOS} mais recentes)" if cortada else ""
+            self.status_label.setText(f"{len(results)} código(s) encontrado(s){aviso} em {duracao:.0f} ms.")
@@ -3,88 +3,342 @@
 import re
 import math
 import io
+import time
 import ezdxf
 
-def create_dxf_drawing(params: dict):
-    """Gera um desenho DXF a partir de um dicionário de parâmetros já preparado."""
+from pieces import Piece, contorno_forma
+from validacao import peca_validada
+
+# Versão da saída DXF; alterar sempre que o arquivo gerado mudar (invalida o cache)
+VERSAO_GERADOR = "2"
+
+# Camadas do DXF: nome -> cor ACI
+CAMADAS = {'CONTORNO': 1, 'FUROS': 3}  # Vermelho, Verde
+
+# Chave dos parâmetros do DXF -> nome da medida em pieces.contorno_forma
+MEDIDAS_PARAMS = {'width': 'largura', 'height': 'altura', 'diameter': 'diametro', 'rt_base': 'rt_base', 'rt_height': 'rt_height',
+                  'trapezoid_large_base': 'trapezoid_large_base', 'trapezoid_small_base': 'trapezoid_small_base',
+                  'trapezoid_height': 'trapezoid_height'}
+
+def contorno_da_forma(params):
+    """Contorno de uma peça a partir dos parâmetros preparados (veja pieces.contorno_forma)."""
+    medidas = {campo: params[chave] for chave, campo in MEDIDAS_PARAMS.items() if chave in params}
+    return contorno_forma(params.get('shape'), medidas)
+
+def nome_arquivo_dxf(part_name):
+    sanitized_filename = re.sub(r'[^\w.-]+', '_', str(part_name))
+    return f"{sanitized_filename}.dxf"
+
+# ======================================================================
+# Escritor DXF nativo (R12)
+# ======================================================================
+
+def _num(valor):
+    return repr(float(valor))
+
+def _cabecalho_r12(camadas):
+    partes = ["0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n0\nENDSEC\n",
+              "0\nSECTION\n2\nTABLES\n",
+              "0\nTABLE\n2\nLTYPE\n70\n1\n0\nLTYPE\n2\nCONTINUOUS\n70\n0\n3\nSolid line\n72\n65\n73\n0\n40\n0.0\n0\nENDTAB\n",
+              f"0\nTABLE\n2\nLAYER\n70\n{len(camadas) + 1}\n",
+              "0\nLAYER\n2\n0\n70\n0\n62\n7\n6\nCONTINUOUS\n"]
+    for nome in camadas:
+        partes.append(f"0\nLAYER\n2\n{nome}\n70\n0\n62\n{CAMADAS[nome]}\n6\nCONTINUOUS\n")
+    partes.append("0\nENDTAB\n0\nENDSEC\n0\nSECTION\n2\nENTITIES\n")
+    return "".join(partes)
+
+def _circulo_r12(camada, cx, cy, raio):
+    return f"0\nCIRCLE\n8\n{camada}\n10\n{_num(cx)}\n20\n{_num(cy)}\n30\n0.0\n40\n{_num(raio)}\n"
+
+def _polilinha_r12(camada, pontos):
+    partes = [f"0\nPOLYLINE\n8\n{camada}\n66\n1\n10\n0.0\n20\n0.0\n30\n0.0\n70\n1\n"]
+    for x, y in pontos:
+        partes.append(f"0\nVERTEX\n8\n{camada}\n10\n{_num(x)}\n20\n{_num(y)}\n30\n0.0\n")
+    partes.append(f"0\nSEQEND\n8\n{camada}\n")
+    return "".join(partes)
+
+def escrever_dxf_nativo(params, stream):
+    """
+    Escreve o DXF da peça diretamente no stream, em texto DXF R12 mínimo (tabelas de
+    camadas e entidades POLYLINE/CIRCLE), sem montar um documento ezdxf.
+    Retorna False, sem escrever nada, se a peça não for suportada por este caminho.
+    """
+    contorno = contorno_da_forma(params)
+    if contorno is None:
+        return False
+    holes = params.get('holes', [])
+    # NaN/infinito não tem representação segura em texto DXF: fica com o ezdxf
+    if contorno[0] == 'circle':
+        valores = [*contorno[1], contorno[2]]
+    else:
+        valores = [v for ponto in contorno[1] for v in ponto]
+    valores += [v for hole in holes for v in (hole['x'], hole['y'], hole['diameter'])]
+    if not all(math.isfinite(float(v)) for v in valores):
+        return False
+
+    camadas = ['CONTORNO', 'FUROS'] if holes else ['CONTORNO']
+    stream.write(_cabecalho_r12(camadas))
+    if contorno[0] == 'circle':
+        (cx, cy), raio = contorno[1], contorno[2]
+        stream.write(_circulo_r12('CONTORNO', cx, cy, raio))
+    else:
+        stream.write(_polilinha_r12('CONTORNO', contorno[1]))
+    for hole in holes:
+        stream.write(_circulo_r12('FUROS', hole['x'], hole['y'], hole['diameter'] / 2))
+    stream.write("0\nENDSEC\n0\nEOF\n")
+    return True
+
+# ======================================================================
+# Geração via ezdxf (formas não suportadas pelo escritor nativo)
+# ======================================================================
+
+def _adicionar_entidades(layout, params):
+    """Desenha contorno e furos da peça em um layout do ezdxf (modelspace ou bloco)."""
+    contorno = contorno_da_forma(params)
+    if contorno is None:
+        return False
+    if contorno[0] == 'circle':
+        layout.add_circle(center=contorno[1], radius=contorno[2], dxfattribs={'layer': 'CONTORNO'})
+    else:
+        layout.add_lwpolyline(contorno[1], close=True, dxfattribs={'layer': 'CONTORNO'})
+    for hole in params.get('holes', []):
+        layout.add_circle(center=(hole['x'], hole['y']), radius=hole['diameter']/2, dxfattribs={'layer': 'FUROS'})
+    return True
+
+def create_dxf_drawing_ezdxf(params: dict, tempos=None):
+    """Gera o DXF montando um documento ezdxf R2000 completo."""
     try:
+        inicio = time.perf_counter()
         doc = ezdxf.new('R2000')
         msp = doc.modelspace()
-        
-        doc.layers.new('CONTORNO', dxfattribs={'color': 1}) # Vermelho
+
+        doc.layers.new('CONTORNO', dxfattribs={'color': CAMADAS['CONTORNO']})
         if params.get('holes'):
-            doc.layers.new('FUROS', dxfattribs={'color': 3}) # Verde
-
-        shape_type = params.get('shape')
-        
-        # Dicionário de formas, agora incluindo o trapézio
-        shape_creators = {
-            'rectangle': lambda m, p: m.add_lwpolyline([(0,0),(p.get('width', 0),0),(p.get('width', 0),p.get('height', 0)),(0,p.get('height', 0))], close=True),
-            'circle': lambda m, p: m.add_circle(center=(p.get('diameter', 0)/2, p.get('diameter', 0)/2), radius=p.get('diameter', 0)/2),
-            'right_triangle': lambda m, p: m.add_lwpolyline([(0,0),(p.get('rt_base', 0),0),(0,p.get('rt_height', 0))], close=True),
-            'trapezoid': lambda m, p: m.add_lwpolyline([
-                (0,0), (p.get('trapezoid_large_base',0),0),
-                (p.get('trapezoid_large_base',0)-((p.get('trapezoid_large_base',0)-p.get('trapezoid_small_base',0))/2),p.get('trapezoid_height',0)),
-                (((p.get('trapezoid_large_base',0)-p.get('trapezoid_small_base',0))/2),p.get('trapezoid_height',0))
-            ], close=True)
-        }
-        
-        if shape_type in shape_creators:
-            shape_creators[shape_type](msp, params).dxf.layer = 'CONTORNO'
-        else:
-            return None, f"Forma '{shape_type}' desconhecida."
+            doc.layers.new('FUROS', dxfattribs={'color': CAMADAS['FUROS']})
 
-        for hole in params.get('holes', []):
-            msp.add_circle(center=(hole['x'], hole['y']), radius=hole['diameter']/2, dxfattribs={'layer': 'FUROS'})
+        if not _adicionar_entidades(msp, params):
+            return None, f"Forma '{params.get('shape')}' desconhecida."
 
+        inicio_escrita = time.perf_counter()
         stream = io.StringIO()
         doc.write(stream)
-        sanitized_filename = re.sub(r'[^\w.-]+', '_', str(params.get('part_name')))
-        return stream.getvalue(), f"{sanitized_filename}.dxf"
+        if tempos is not None:
+            tempos['dxf_construcao'] = inicio_escrita - inicio
+            tempos['dxf_escrita'] = time.perf_counter() - inicio_escrita
+        return stream.getvalue(), nome_arquivo_dxf(params.get('part_name'))
 
     except Exception as e:
         print(f"Erro inesperado no desenho do DXF: {e}")
         return None, "Erro interno de desenho."
 
-def prepare_and_validate_dxf_data(raw_data: dict): # <<<--- NOME CORRIGIDO AQUI
-    """Prepara e valida os dados para a geração do DXF (sem cotas ou texto)."""
-    params = raw_data.copy()
-
-    # Mapeamento de nomes de colunas
-    params['part_name'] = params.get('nome_arquivo')
-    params['shape'] = params.get('forma')
-    params['width'] = params.get('largura')
-    params['height'] = params.get('altura')
-    params['diameter'] = params.get('diametro')
-    
-    # Desliga permanentemente cotas e texto para o DXF
-    params['include_dims'] = False 
-    params['include_text_info'] = False
-    
-    if not params.get('part_name') or not params.get('shape'):
-        return None, "Dados insuficientes: 'part_name' ou 'shape' ausentes."
-
-    def to_float(value, default=0.0):
-        if value is None or value == '': return default
-        try: return float(str(value).replace(',', '.'))
-        except (ValueError, TypeError): return default
-
-    # Lista completa de chaves numéricas
-    numeric_keys = [
-        'width', 'height', 'diameter', 'rt_base', 'rt_height', 
-        'trapezoid_large_base', 'trapezoid_small_base', 'trapezoid_height'
-    ]
-    for key in numeric_keys:
-        params[key] = to_float(params.get(key))
-        
-    # Converte furos
-    params['holes'] = []
-    if 'furos' in params and isinstance(params['furos'], list):
-        for furo_pyqt in params['furos']:
-            params['holes'].append({
-                'diameter': to_float(furo_pyqt.get('diam')),
-                'x': to_float(furo_pyqt.get('x')),
-                'y': to_float(furo_pyqt.get('y'))
-            })
-            
-    return params, None
\ No newline at end of file
+def create_dxf_drawing(params: dict, tempos=None, nativo=True):
+    """
+    Gera um desenho DXF a partir de um dicionário de parâmetros já preparado.
+    Usa o escritor nativo para as formas padrão e recorre ao ezdxf para o resto.
+    Se 'tempos' for um dicionário, recebe a duração da construção e da escrita do documento.
+    """
+    if nativo:
+        inicio = time.perf_counter()
+        stream = io.StringIO()
+        if escrever_dxf_nativo(params, stream):
+            if tempos is not None:
+                tempos['dxf_construcao'] = 0.0
+                tempos['dxf_escrita'] = time.perf_counter() - inicio
+            return stream.getvalue(), nome_arquivo_dxf(params.get('part_name'))
+    return create_dxf_drawing_ezdxf(params, tempos)
+
+def geometria_dxf(conteudo):
+    """
+    Lê um DXF e devolve suas camadas e entidades em forma comparável (coordenadas
+    arredondadas, em ordem), independente da versão do arquivo e do tipo de polilinha.
+    """
+    doc = ezdxf.read(io.StringIO(conteudo))
+    camadas = {layer.dxf.name: layer.color for layer in doc.layers if layer.dxf.name in CAMADAS}
+    entidades = []
+    for e in doc.modelspace():
+        if e.dxftype() == 'CIRCLE':
+            entidades.append(('circle', e.dxf.layer, round(e.dxf.center.x, 9), round(e.dxf.center.y, 9), round(e.dxf.radius, 9)))
+        elif e.dxftype() == 'LWPOLYLINE':
+            pontos = tuple((round(x, 9), round(y, 9)) for x, y in e.get_points('xy'))
+            entidades.append(('polyline', e.dxf.layer, e.closed, pontos))
+        elif e.dxftype() == 'POLYLINE':
+            pontos = tuple((round(p.x, 9), round(p.y, 9)) for p in e.points())
+            entidades.append(('polyline', e.dxf.layer, e.is_closed, pontos))
+        else:
+            entidades.append((e.dxftype(), e.dxf.layer))
+    return camadas, entidades
+
+def verificar_equivalencia(params):
+    """Confere se o escritor nativo e o ezdxf produzem a mesma geometria para a peça."""
+    nativo, _ = create_dxf_drawing(params, nativo=True)
+    referencia, _ = create_dxf_drawing_ezdxf(params)
+    if nativo is None or referencia is None:
+        return nativo == referencia
+    return geometria_dxf(nativo) == geometria_dxf(referencia)
+
+def prepare_and_validate_dxf_data(piece): # <<<--- NOME CORRIGIDO AQUI
+    """
+    Prepara os dados para a geração do DXF (sem cotas ou texto). A validação já vem
+    feita em validacao.validar_dataframe: peças com 'erro' são recusadas com essa mensagem.
+    Aceita uma Piece ou, por compatibilidade, um dicionário com as colunas da lista de peças.
+    """
+    if not isinstance(piece, Piece):
+        piece = peca_validada(piece)
+
+    if piece.erro:
+        return None, piece.erro
+
+    # Mapeamento de nomes de colunas (os valores já chegam convertidos em float)
+    params = {
+        'part_name': piece.nome_arquivo,
+        'shape': piece.forma,
+        'width': piece.largura,
+        'height': piece.altura,
+        'diameter': piece.diametro,
+        'rt_base': piece.rt_base,
+        'rt_height': piece.rt_height,
+        'trapezoid_large_base': piece.trapezoid_large_base,
+        'trapezoid_small_base': piece.trapezoid_small_base,
+        'trapezoid_height': piece.trapezoid_height,
+        # Desliga permanentemente cotas e texto para o DXF
+        'include_dims': False,
+        'include_text_info': False,
+        'holes': [{'diameter': furo.diam, 'x': furo.x, 'y': furo.y} for furo in piece.furos],
+    }
+    return params, None
+
+def build_dxf_payload(piece):
+    """DXF de uma peça: (nome_da_peca, conteudo_dxf, nome_do_arquivo, erro, tempos {etapa: segundos})."""
+    part_name = piece.nome_arquivo if isinstance(piece, Piece) else piece.get('nome_arquivo')
+    tempos = {}
+    inicio = time.perf_counter()
+    prepared_data, error = prepare_and_validate_dxf_data(piece)
+    tempos['dxf_preparacao'] = time.perf_counter() - inicio
+    if error:
+        return part_name, None, None, error, tempos
+    dxf_content, filename = create_dxf_drawing(prepared_data, tempos)
+    return part_name, dxf_content, filename, None, tempos
+
+def build_dxf_payloads(pieces):
+    """build_dxf_payload de um lote de peças, numa única tarefa do pool de processos."""
+    return [build_dxf_payload(piece) for piece in pieces]
+
+# ======================================================================
+# DXF de chapa: um desenho por espessura, com BLOCK/INSERT
+# ======================================================================
+
+# Modos de saída dos DXFs: um arquivo por peça (no ZIP) ou uma chapa por espessura
+MODO_DXF_PECAS = 'pecas'
+MODO_DXF_CHAPA = 'chapa'
+MODOS_DXF = (MODO_DXF_PECAS, MODO_DXF_CHAPA)
+
+# Disposição das peças na chapa (mm): linhas de até LARGURA_MAXIMA_CHAPA, separadas por ESPACAMENTO_CHAPA
+LARGURA_MAXIMA_CHAPA = 3000.0
+ESPACAMENTO_CHAPA = 10.0
+
+def _limites_contorno(contorno):
+    """Retângulo envolvente do contorno: (x_min, y_min, largura, altura)."""
+    if contorno[0] == 'circle':
+        (cx, cy), raio = contorno[1], contorno[2]
+        return cx - raio, cy - raio, 2 * raio, 2 * raio
+    xs = [x for x, _ in contorno[1]]
+    ys = [y for _, y in contorno[1]]
+    return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
+
+def _nome_bloco(part_name, usados):
+    base = re.sub(r'[^\w-]+', '_', str(part_name)) or 'PECA'
+    nome, sufixo = base, 2
+    while nome.upper() in usados:
+        nome, sufixo = f"{base}_{sufixo}", sufixo + 1
+    usados.add(nome.upper())
+    return nome
+
+def build_sheet_dxf(pecas):
+    """
+    DXF de chapa de uma espessura: um BLOCK por geometria e um INSERT por unidade de 'qtd'.
+    Retorna (conteudo_dxf ou None, avisos [(nome_da_peca, mensagem)], tempos).
+    """
+    tempos = {}
+    inicio = time.perf_counter()
+    avisos = []
+    doc = ezdxf.new('R2000')
+    for nome, cor in CAMADAS.items():
+        doc.layers.new(nome, dxfattribs={'color': cor})
+    msp = doc.modelspace()
+
+    # Geometria -> (nome do bloco, limites)
+    blocos = {}
+    nomes_usados = set()
+    x = y = altura_linha = 0.0
+    for peca in pecas:
+        if not isinstance(peca, Piece):
+            peca = peca_validada(peca)
+        params, error = prepare_and_validate_dxf_data(peca)
+        if error:
+            avisos.append((peca.nome_arquivo, error))
+            continue
+        copias = int(round(peca.qtd)) if peca.qtd and not math.isnan(peca.qtd) else 0
+        if copias <= 0:
+            avisos.append((peca.nome_arquivo, "quantidade zero, nenhuma cópia na chapa."))
+            continue
+
+        chave = peca.chave_geometria()
+        if chave not in blocos:
+            nome_bloco = _nome_bloco(params['part_name'], nomes_usados)
+            _adicionar_entidades(doc.blocks.new(nome_bloco), params)
+            blocos[chave] = (nome_bloco, _limites_contorno(contorno_da_forma(params)))
+        nome_bloco, (x_min, y_min, largura, altura) = blocos[chave]
+
+        for _ in range(copias):
+            if x > 0 and x + largura > LARGURA_MAXIMA_CHAPA:
+                x, y, altura_linha = 0.0, y + altura_linha + ESPACAMENTO_CHAPA, 0.0
+            msp.add_blockref(nome_bloco, (x - x_min, y - y_min))
+            x += largura + ESPACAMENTO_CHAPA
+            altura_linha = max(altura_linha, altura)
+
+    if not blocos:
+        tempos['dxf_construcao'] = time.perf_counter() - inicio
+        return None, avisos, tempos
+
+    inicio_escrita = time.perf_counter()
+    stream = io.StringIO()
+    doc.write(stream)
+    tempos['dxf_construcao'] = inicio_escrita - inicio
+    tempos['dxf_escrita'] = time.perf_counter() - inicio_escrita
+    return stream.getvalue(), avisos, tempos
+
+# ======================================================================
+# Comparação de desempenho: python dxf_engine.py [quantidade]
+# ======================================================================
+
+if __name__ == '__main__':
+    import sys
+    import random
+
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    gerador = random.Random(42)
+    formas = ('rectangle', 'circle', 'right_triangle', 'trapezoid')
+    pecas = []
+    for i in range(quantidade):
+        furos = [{'diam': gerador.choice((8, 10, 12.5)), 'x': gerador.uniform(20, 80), 'y': gerador.uniform(20, 80)}
+                 for _ in range(gerador.randint(0, 6))]
+        pecas.append(Piece.from_mapping({'nome_arquivo': f'P{i:05d}', 'forma': formas[i % 4], 'espessura': 3,
+                                         'largura': 100 + i % 50, 'altura': 120, 'diametro': 150, 'rt_base': 100,
+                                         'rt_height': 90, 'trapezoid_large_base': 200, 'trapezoid_small_base': 120,
+                                         'trapezoid_height': 80, 'furos': furos}))
+    lista_params = [prepare_and_validate_dxf_data(peca)[0] for peca in pecas]
+
+    divergentes = [p['part_name'] for p in lista_params if not verificar_equivalencia(p)]
+    print(f"Equivalência nativo x ezdxf: {len(lista_params) - len(divergentes)}/{len(lista_params)} peças idênticas")
+    for nome in divergentes[:10]:
+        print(f"  DIVERGENTE: {nome}")
+
+    tempos_caminho = {}
+    for nativo in (False, True):
+        inicio = time.perf_counter()
+        for params in lista_params:
+            create_dxf_drawing(params, nativo=nativo)
+        tempos_caminho[nativo] = time.perf_counter() - inicio
+        rotulo = "nativo" if nativo else "ezdxf "
+        print(f"{rotulo}: {tempos_caminho[nativo] / quantidade * 1000:.3f} ms/peça ({tempos_caminho[nativo]:.2f} s)")
+    print(f"Ganho: {tempos_caminho[False] / tempos_caminho[True]:.1f}x")
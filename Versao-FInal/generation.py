@@ -0,0 +1,415 @@
+# generation.py
+
+import os
+import glob
+import time
+from functools import partial
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime
+import pandas as pd
+
+# Importa os módulos de geração de arquivos
+import dxf_engine
+import pdf_generator
+from metrics import RunMetrics
+from ordem_furos import VERSAO_ORDEM, ordenar_furos_pecas
+from pieces import pieces_from_dataframe
+from validacao import validar_dataframe, validar_furos, salvar_relatorio
+from render_cache import RenderCache, chave_peca, chave_arquivo
+
+# Limite de lotes de DXFs em processamento (ou aguardando gravação) por worker
+MAX_DXF_PENDENTES_POR_WORKER = 4
+# Peças por tarefa enviada ao pool: um DXF leva menos de 1 ms, bem menos que o envio de uma tarefa
+MAX_PECAS_POR_LOTE_DXF = 64
+
+def agrupar_por_espessura(pecas):
+    """Agrupa as peças por espessura (ordem crescente, peças sem espessura por último)."""
+    grupos = {}
+    for peca in pecas:
+        grupos.setdefault(peca.espessura, []).append(peca)
+    return sorted(grupos.items(), key=lambda item: (item[0] is None, item[0] or 0))
+
+def nomes_geometrias_repetidas(pecas):
+    """
+    Encontra as peças com geometria idêntica (mesma chave normalizada) dentro de um PDF.
+    Retorna, alinhado com 'pecas', o nome do Form XObject compartilhado ou None para peças únicas.
+    """
+    contagem = Counter(peca.chave_geometria() for peca in pecas)
+    nomes = {}
+    resultado = []
+    for peca in pecas:
+        chave = peca.chave_geometria()
+        if contagem[chave] > 1:
+            resultado.append(nomes.setdefault(chave, f"Geometria{len(nomes) + 1}"))
+        else:
+            resultado.append(None)
+    return resultado
+
+def dividir_em_blocos(pecas, max_paginas):
+    if not max_paginas:
+        return [pecas]
+    return [pecas[i:i + max_paginas] for i in range(0, len(pecas), max_paginas)]
+
+def nome_parte_temporaria(pdf_filename, bloco, parte):
+    """Arquivo temporário da parte 'parte' do bloco 'bloco' de uma espessura; o nome final vem de numerar_partes."""
+    base, extensao = os.path.splitext(pdf_filename)
+    return f"{base}.bloco{bloco:04d}-{parte:03d}{extensao}"
+
+def remover_blocos_temporarios(pdf_filename):
+    """Apaga os arquivos temporários de bloco da espessura que sobraram de uma geração que falhou."""
+    base, extensao = os.path.splitext(pdf_filename)
+    for temporario in glob.glob(glob.escape(base) + ".bloco*" + extensao):
+        os.remove(temporario)
+
+def numerar_partes(pdf_filename, arquivos):
+    """
+    Renomeia as partes temporárias de uma espessura (na ordem das peças) para o nome final: o próprio
+    'pdf_filename' se houver um só, ou '<nome>_parte01.pdf', '<nome>_parte02.pdf'...
+    Partes antigas que sobraram de uma execução anterior são removidas.
+    """
+    base, extensao = os.path.splitext(pdf_filename)
+    if len(arquivos) == 1:
+        finais = [pdf_filename]
+    else:
+        finais = [f"{base}_parte{numero:02d}{extensao}" for numero in range(1, len(arquivos) + 1)]
+    for antigo in glob.glob(glob.escape(base) + "_parte*" + extensao) + [pdf_filename]:
+        if antigo not in finais and os.path.exists(antigo):
+            os.remove(antigo)
+    for temporario, final in zip(arquivos, finais):
+        os.replace(temporario, final)
+    return finais
+
+def lotes_com_cache(itens, resultado_pronto, tamanho):
+    """
+    Agrupa os pares (chave, argumento) em lotes de até 'tamanho' argumentos a processar.
+    Cada lote sai como ([(chave, resultado_pronto ou None), ...], [argumentos]); os itens
+    já resolvidos por 'resultado_pronto' (ex.: cache) acompanham o lote sem ocupar espaço nele.
+    """
+    chaves, argumentos = [], []
+    for chave, argumento in itens:
+        pronto = resultado_pronto(chave) if resultado_pronto else None
+        chaves.append((chave, pronto))
+        if pronto is None:
+            argumentos.append(argumento)
+            if len(argumentos) >= tamanho:
+                yield chaves, argumentos
+                chaves, argumentos = [], []
+    if chaves:
+        yield chaves, argumentos
+
+def desfazer_lotes(resultados_lotes):
+    """Inverso de lotes_com_cache: devolve os pares (chave, resultado) na ordem original."""
+    for chaves, resultados in resultados_lotes:
+        resultados = iter(resultados)
+        for chave, pronto in chaves:
+            yield chave, pronto if pronto is not None else next(resultados)
+
+def nome_espessura(espessura):
+    """Espessura no nome dos arquivos: 2.0 -> '2' (como nas planilhas com espessuras inteiras), 2.5 -> '2_5'."""
+    if espessura is None:
+        return 'Sem_Espessura'
+    texto = str(int(espessura)) if float(espessura).is_integer() else str(espessura)
+    return texto.replace('.', '_')
+
+def map_ordenado(executor, func, itens, max_pendentes):
+    """
+    Aplica 'func' aos argumentos de 'itens' (pares chave/argumento) e devolve pares
+    (chave, resultado) na ordem de envio. Consome a entrada aos poucos: no máximo
+    'max_pendentes' tarefas ficam em voo. Sem executor, executa no próprio thread.
+    """
+    pendentes = deque()
+    for chave, argumento in itens:
+        if executor is not None:
+            future = executor.submit(func, argumento)
+        else:
+            future = Future()
+            future.set_result(func(argumento))
+        pendentes.append((chave, future))
+        if len(pendentes) >= max_pendentes:
+            chave_pronta, future_pronto = pendentes.popleft()
+            yield chave_pronta, future_pronto.result()
+    while pendentes:
+        chave_pronta, future_pronto = pendentes.popleft()
+        yield chave_pronta, future_pronto.result()
+
+class GenerationJob:
+    """
+    Executa a geração de PDFs e DXFs de um lote de peças, sem nenhuma dependência do Qt.
+    As mensagens e o progresso (0-100) são entregues pelas funções 'log' e 'progress',
+    o que permite usar a mesma rotina na interface gráfica e na linha de comando.
+    """
+    def __init__(self, dataframe_to_process, generate_pdf=True, generate_dxf=True, project_directory=".",
+                 workers=1, pdf_invariant=None, use_cache=True, max_paginas_pdf=None, max_bytes_pdf=None,
+                 dxf_mode=dxf_engine.MODO_DXF_PECAS, ordenar_furos=False, log=print, progress=None):
+        self.df = dataframe_to_process
+        self.generate_pdf = generate_pdf
+        self.generate_dxf = generate_dxf
+        self.project_directory = project_directory
+        # Número de processos usados na renderização (1 = modo sequencial)
+        self.workers = max(1, int(workers or 1))
+        # Modo "invariant" do ReportLab: PDFs idênticos byte a byte entre execuções
+        self.pdf_invariant = pdf_invariant
+        # Reaproveita PDFs e DXFs de peças que não mudaram desde a última geração
+        self.use_cache = use_cache
+        # Limites por arquivo PDF; ao atingir, a espessura continua em partes numeradas
+        self.max_paginas_pdf = max_paginas_pdf
+        self.max_bytes_pdf = max_bytes_pdf
+        # 'pecas': um DXF por peça em um ZIP; 'chapa': um DXF por espessura, com blocos
+        if dxf_mode not in dxf_engine.MODOS_DXF:
+            raise ValueError(f"Modo de DXF inválido: '{dxf_mode}'. Use um de: {', '.join(dxf_engine.MODOS_DXF)}.")
+        self.dxf_mode = dxf_mode
+        # Reordena os furos nos DXFs (vizinho mais próximo + 2-opt) para encurtar o percurso da máquina
+        self.ordenar_furos = ordenar_furos
+        self.log = log
+        self.progress = progress or (lambda valor: None)
+        # Peças que não puderam ser geradas: linhas recusadas na validação mais erros de desenho
+        self.falhas = 0
+        # Linhas recusadas na validação: DataFrame com 'linha', 'nome_arquivo' e 'erro'
+        self.relatorio_validacao = None
+        # Tempos por etapa e por peça; gravado em 'run_metrics.json' no diretório do projeto
+        self.metrics = RunMetrics(self.workers)
+
+    def run(self):
+        """Gera os arquivos pedidos. Erros críticos são propagados para quem chamou."""
+        total_items = len(self.df)
+        if total_items == 0:
+            return "Nada a processar. A lista de peças está vazia."
+
+        self.log("Iniciando processamento...")
+        with self.metrics.etapa('validacao'):
+            # Valida e normaliza o DataFrame inteiro de uma vez; os motores confiam no campo 'erro' de cada Piece
+            df_limpo, relatorio = validar_dataframe(self.df)
+        with self.metrics.etapa('preparacao'):
+            # Converte o DataFrame uma única vez; daqui em diante as etapas usam Piece
+            pecas = pieces_from_dataframe(df_limpo)
+            cache = RenderCache(self.project_directory) if self.use_cache else None
+        with self.metrics.etapa('validacao'):
+            # Furos fora do contorno ou sobrepostos: checados antes de gravar qualquer arquivo
+            relatorio_furos = validar_furos(pecas)
+        self._registrar_validacao(relatorio, relatorio_furos)
+
+        if self.generate_pdf:
+            inicio = time.perf_counter()
+            self._gerar_pdfs(pecas, cache)
+            self.metrics.registrar_saida('pdf', total_items, time.perf_counter() - inicio)
+
+        if self.generate_dxf:
+            inicio = time.perf_counter()
+            pecas_dxf = self._ordenar_furos(pecas) if self.ordenar_furos else pecas
+            if self.dxf_mode == dxf_engine.MODO_DXF_CHAPA:
+                self._gerar_dxfs_chapa(pecas_dxf)
+            else:
+                # A chave do cache vem das peças como estão na planilha (mais a marca da reordenação)
+                self._gerar_dxfs(pecas_dxf, cache, pecas)
+            self.metrics.registrar_saida('dxf', total_items, time.perf_counter() - inicio)
+
+        if cache:
+            cache.save()
+        self._salvar_metricas()
+        return "Processamento concluído com sucesso!"
+
+    def _ordenar_furos(self, pecas):
+        with self.metrics.etapa('ordem_furos'):
+            pecas_ordenadas, antes, depois = ordenar_furos_pecas(pecas)
+        if antes > 0:
+            self.log(f"Ordem de furação otimizada: deslocamento estimado de {antes:.0f} mm para {depois:.0f} mm "
+                     f"({(antes - depois) / antes * 100:.1f}% menor).")
+        return pecas_ordenadas
+
+    def _registrar_validacao(self, *relatorios):
+        relatorios = [r for r in relatorios if not r.empty]
+        self.relatorio_validacao = (pd.concat(relatorios).sort_values('linha', kind='stable').reset_index(drop=True)
+                                    if relatorios else pd.DataFrame(columns=['linha', 'nome_arquivo', 'erro']))
+        # Cada linha recusada é uma peça a menos nos PDFs e DXFs, mesmo que só o PDF seja gerado
+        self.falhas += len(self.relatorio_validacao)
+        for linha, nome, erro in self.relatorio_validacao.itertuples(index=False):
+            self.log(f"ERRO de validação na linha {linha} ('{nome or 'sem nome'}'): {erro}")
+        caminho = os.path.join(self.project_directory, "erros_validacao.json")
+        try:
+            if salvar_relatorio(self.relatorio_validacao, caminho):
+                self.log(f"AVISO: {len(self.relatorio_validacao)} peça(s) inválida(s) serão marcadas nos PDFs e puladas nos DXFs. "
+                         f"Relatório salvo em: {caminho}")
+        except OSError as e:
+            self.log(f"AVISO: Não foi possível salvar 'erros_validacao.json': {e}")
+
+    def _salvar_metricas(self):
+        for linha in self.metrics.linhas_resumo():
+            self.log(linha)
+        try:
+            self.metrics.salvar(os.path.join(self.project_directory, "run_metrics.json"))
+        except OSError as e:
+            self.log(f"AVISO: Não foi possível salvar 'run_metrics.json': {e}")
+
+    def _gerar_pdfs(self, pecas, cache):
+        self.log("--- Gerando PDFs ---")
+        pdf_output_dir = os.path.join(self.project_directory, "PDFs")
+        os.makedirs(pdf_output_dir, exist_ok=True)
+
+        total_items = len(pecas)
+        tarefas = []
+        # Por espessura: chave do cache, número de blocos pendentes e arquivos gerados por bloco
+        grupos = {}
+        pecas_concluidas = 0
+        for espessura, group in agrupar_por_espessura(pecas):
+            pdf_filename = os.path.join(pdf_output_dir, f"Desenhos_PDF_Espessura_{nome_espessura(espessura)}mm.pdf")
+            chave = None
+            if cache:
+                with self.metrics.etapa('cache'):
+                    chaves = (chave_peca(peca, pdf_generator.VERSAO_GERADOR) for peca in group)
+                    chave = chave_arquivo(chaves, self.pdf_invariant, self.max_paginas_pdf, self.max_bytes_pdf)
+                    atualizado = cache.pdf_atualizado(pdf_filename, chave)
+                if atualizado:
+                    pecas_concluidas += len(group)
+                    self.log(f"PDF sem alterações (cache): {pdf_filename}")
+                    continue
+            # Grupos grandes são divididos em blocos de páginas, gravados (e paralelizados) de forma independente
+            blocos = dividir_em_blocos(group, self.max_paginas_pdf)
+            grupos[pdf_filename] = {'chave': chave, 'pendentes': len(blocos), 'arquivos': {}}
+            for indice, bloco in enumerate(blocos):
+                # As partes são gravadas com nome temporário; numerar_partes dá o nome final
+                destino = partial(nome_parte_temporaria, pdf_filename, indice)
+                with self.metrics.etapa('deduplicacao'):
+                    nomes_geometria = nomes_geometrias_repetidas(bloco)
+                tarefas.append((pdf_filename, indice, destino, bloco, nomes_geometria))
+
+        try:
+            if self.workers > 1 and len(tarefas) > 1:
+                # Cada espessura (ou bloco) vira um PDF independente, renderizado em um processo separado
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(tarefas))) as executor:
+                    futures = {executor.submit(pdf_generator.gerar_pdf_espessura, destino, bloco, self.pdf_invariant, nomes_geometria, self.max_bytes_pdf): (pdf_filename, indice, len(bloco))
+                               for pdf_filename, indice, destino, bloco, nomes_geometria in tarefas}
+                    for future in as_completed(futures):
+                        pdf_filename, indice, quantidade = futures[future]
+                        pecas_concluidas += quantidade
+                        self._pdf_concluido(future.result(), pdf_filename, indice, grupos, cache)
+                        self.progress(int((pecas_concluidas / total_items) * 100))
+            else:
+                for pdf_filename, indice, destino, bloco, nomes_geometria in tarefas:
+                    resultado = pdf_generator.gerar_pdf_espessura(destino, bloco, self.pdf_invariant, nomes_geometria, self.max_bytes_pdf)
+                    pecas_concluidas += len(bloco)
+                    self._pdf_concluido(resultado, pdf_filename, indice, grupos, cache)
+                    self.progress(int((pecas_concluidas / total_items) * 100))
+        finally:
+            # Após uma falha, as partes já gravadas das espessuras incompletas não ficam no disco
+            for pdf_filename in grupos:
+                remover_blocos_temporarios(pdf_filename)
+
+    def _pdf_concluido(self, resultado, pdf_filename, indice, grupos, cache):
+        arquivos, tempos_paginas, tempo_gravacao = resultado
+        self.metrics.adicionar_tempos({'pdf_desenho': sum(tempos_paginas), 'pdf_gravacao': tempo_gravacao})
+        self.metrics.registrar_latencias('pdf', tempos_paginas)
+        for arquivo in arquivos:
+            self.metrics.registrar_bytes('pdf', os.path.getsize(arquivo))
+
+        grupo = grupos[pdf_filename]
+        grupo['arquivos'][indice] = arquivos
+        grupo['pendentes'] -= 1
+        if grupo['pendentes'] > 0:
+            return
+        # Todos os blocos da espessura prontos: numera as partes na ordem das peças
+        gerados = [arquivo for i in sorted(grupo['arquivos']) for arquivo in grupo['arquivos'][i]]
+        gerados = numerar_partes(pdf_filename, gerados)
+        if cache: cache.registrar_pdf(pdf_filename, grupo['chave'], gerados)
+        for arquivo in gerados:
+            self.log(f"PDF salvo em: {arquivo}")
+
+    def _gerar_dxfs(self, pecas, cache, pecas_chave=None):
+        self.log("--- Gerando DXFs ---")
+        dxf_output_dir = os.path.join(self.project_directory, "DXFs")
+        os.makedirs(dxf_output_dir, exist_ok=True)
+        zip_filename = os.path.join(dxf_output_dir, f"LOTE_DXF_{datetime.now():%Y%m%d_%H%M%S}.zip")
+
+        total_items = len(pecas)
+        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+            ordem_furos = VERSAO_ORDEM if self.ordenar_furos else None
+            itens = ((chave_peca(original, dxf_engine.VERSAO_GERADOR, ordem_furos) if cache and not peca.erro else None, peca)
+                     for original, peca in zip(pecas_chave or pecas, pecas))
+            buscar_no_cache = self._buscar_dxf_no_cache(cache) if cache else None
+            # Peças enviadas em lotes: uma tarefa por peça custaria mais que o próprio desenho
+            tamanho_lote = max(1, min(MAX_PECAS_POR_LOTE_DXF, -(-total_items // (self.workers * MAX_DXF_PENDENTES_POR_WORKER))))
+            lotes = lotes_com_cache(itens, buscar_no_cache, tamanho_lote)
+            total_lotes = -(-total_items // tamanho_lote)
+            # Mais processos que núcleos só acrescenta troca de contexto ao desenho, que é curto
+            workers = min(self.workers, total_lotes, os.cpu_count() or 1)
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    resultados = map_ordenado(executor, dxf_engine.build_dxf_payloads, lotes, workers * MAX_DXF_PENDENTES_POR_WORKER)
+                    self._gravar_dxfs(zf, desfazer_lotes(resultados), total_items, cache)
+            else:
+                resultados = map_ordenado(None, dxf_engine.build_dxf_payloads, lotes, 1)
+                self._gravar_dxfs(zf, desfazer_lotes(resultados), total_items, cache)
+
+        if cache:
+            cache.limpar_dxf_nao_usados()
+            self.log(f"{cache.dxf_reaproveitados} de {total_items} DXF(s) reaproveitados do cache.")
+
+        self.metrics.registrar_bytes('dxf', os.path.getsize(zip_filename))
+        self.log(f"Arquivo ZIP com DXFs salvo em: {zip_filename}")
+
+    def _gerar_dxfs_chapa(self, pecas):
+        self.log("--- Gerando DXFs de chapa por espessura ---")
+        dxf_output_dir = os.path.join(self.project_directory, "DXFs")
+        os.makedirs(dxf_output_dir, exist_ok=True)
+
+        total_items = len(pecas)
+        grupos = agrupar_por_espessura(pecas)
+        itens = (((nome_espessura(espessura), len(group)), group) for espessura, group in grupos)
+        if self.workers > 1 and len(grupos) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(grupos))) as executor:
+                self._gravar_dxfs_chapa(dxf_output_dir, map_ordenado(executor, dxf_engine.build_sheet_dxf, itens, self.workers), total_items)
+        else:
+            self._gravar_dxfs_chapa(dxf_output_dir, map_ordenado(None, dxf_engine.build_sheet_dxf, itens, 1), total_items)
+
+    def _gravar_dxfs_chapa(self, dxf_output_dir, resultados, total_items):
+        pecas_concluidas = 0
+        for (nome, quantidade), (dxf_content, avisos, tempos) in resultados:
+            pecas_concluidas += quantidade
+            self.metrics.adicionar_tempos(tempos)
+            for part_name, error in avisos:
+                self.log(f"AVISO: Pulando DXF '{part_name}': {error}")
+            if dxf_content is None:
+                self.log(f"AVISO: Nenhuma peça válida na espessura {nome}; DXF de chapa não gerado.")
+            else:
+                # Uma única latência por chapa, distribuída pelas peças que ela contém
+                self.metrics.registrar_latencias('dxf', [sum(tempos.values()) / quantidade] * quantidade)
+                dxf_filename = os.path.join(dxf_output_dir, f"Chapa_Espessura_{nome}mm.dxf")
+                with open(dxf_filename, 'w', encoding='utf-8', newline='') as f:
+                    f.write(dxf_content)
+                self.metrics.registrar_bytes('dxf', os.path.getsize(dxf_filename))
+                self.log(f"DXF de chapa salvo em: {dxf_filename}")
+            self.progress(int((pecas_concluidas / total_items) * 100))
+
+    @staticmethod
+    def _buscar_dxf_no_cache(cache):
+        def buscar(chave):
+            em_cache = cache.buscar_dxf(chave) if chave else None
+            if em_cache is None:
+                return None
+            filename, dxf_content = em_cache
+            return None, dxf_content, filename, None, None
+        return buscar
+
+    def _gravar_dxfs(self, zf, resultados, total_items, cache=None):
+        """Único escritor do ZIP: grava os DXFs na ordem em que as peças foram enviadas."""
+        for index, (chave, (part_name, dxf_content, filename, error, tempos)) in enumerate(resultados):
+            if tempos:
+                self.metrics.adicionar_tempos(tempos)
+                if dxf_content:
+                    self.metrics.registrar_latencias('dxf', [sum(tempos.values())])
+            if error:
+                # Peça recusada na validação (já contada em falhas)
+                self.log(f"AVISO: Pulando DXF '{part_name}': {error}")
+            elif dxf_content:
+                with self.metrics.etapa('zip'):
+                    zf.writestr(filename, dxf_content)
+                if cache:
+                    with self.metrics.etapa('cache'):
+                        cache.registrar_dxf(chave, filename, dxf_content)
+            else:
+                self.falhas += 1
+                self.log(f"ERRO: Falha ao gerar DXF para '{part_name}'.")
+
+            progress = int(((index + 1) / total_items) * 100)
+            self.progress(progress)
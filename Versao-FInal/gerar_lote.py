@@ -0,0 +1,82 @@
+# gerar_lote.py
+"""
+Geração de PDFs e DXFs em lote pela linha de comando, sem interface gráfica.
+
+Exemplo:
+    python gerar_lote.py pecas.xlsx saida/ --pdf --dxf --workers 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+import profiling
+import dxf_engine
+from generation import GenerationJob
+from planilha import carregar_planilha
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os desenhos (PDF) e os arquivos de corte (DXF) de uma planilha de peças.")
+    parser.add_argument("planilha", help="Planilha Excel com as mesmas colunas da lista de peças da interface.")
+    parser.add_argument("saida", help="Diretório de saída (as pastas PDFs/ e DXFs/ são criadas dentro dele).")
+    parser.add_argument("--pdf", action="store_true", help="Gera os PDFs por espessura.")
+    parser.add_argument("--dxf", action="store_true", help="Gera o ZIP com os DXFs das peças.")
+    parser.add_argument("--dxf-modo", choices=dxf_engine.MODOS_DXF, default=dxf_engine.MODO_DXF_PECAS,
+                        help="'pecas': um DXF por peça em um ZIP (padrão); 'chapa': um DXF por espessura, com blocos e uma inserção por unidade.")
+    parser.add_argument("--ordenar-furos", action="store_true", help="Reordena os furos de cada DXF para encurtar o deslocamento da máquina entre eles.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Número de processos em paralelo (padrão: número de CPUs).")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignora o cache incremental e regera todas as peças.")
+    parser.add_argument("--invariant", action="store_true", help="PDFs idênticos byte a byte entre execuções (modo invariant do ReportLab).")
+    parser.add_argument("--max-paginas", type=int, default=None, help="Máximo de páginas por PDF; espessuras maiores viram <nome>_parte01.pdf, _parte02.pdf...")
+    parser.add_argument("--max-mb", type=float, default=None, help="Tamanho máximo de cada PDF, em MB (também divide em partes). É uma estimativa pelo "
+                        "conteúdo das páginas antes da compressão: os arquivos reais podem ficar bem menores.")
+    parser.add_argument("--profile", action="store_true", help=f"Grava um perfil cProfile em <saida>/perfil (o mesmo que {profiling.ENV_PROFILE}=1).")
+    parser.add_argument("--tracemalloc", action="store_true", help=f"Grava as maiores alocações de memória em <saida>/perfil (o mesmo que {profiling.ENV_TRACEMALLOC}=1).")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Mostra apenas avisos, erros e o resumo final.")
+    args = parser.parse_args(argv)
+    if not args.pdf and not args.dxf:
+        args.pdf = args.dxf = True
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    inicio = time.perf_counter()
+
+    try:
+        df = carregar_planilha(args.planilha)
+    except Exception as e:
+        print(f"ERRO: Falha ao ler a planilha '{args.planilha}': {e}", file=sys.stderr)
+        return 2
+    tempo_leitura = time.perf_counter() - inicio
+
+    def log(message):
+        if not args.quiet or message.startswith(("AVISO", "ERRO", "PDF:", "DXF:", "Etapas:")):
+            print(message)
+
+    os.makedirs(args.saida, exist_ok=True)
+    job = GenerationJob(df, args.pdf, args.dxf, args.saida, workers=args.workers,
+                        pdf_invariant=1 if args.invariant else None, use_cache=not args.sem_cache,
+                        max_paginas_pdf=args.max_paginas, dxf_mode=args.dxf_modo, ordenar_furos=args.ordenar_furos,
+                        max_bytes_pdf=int(args.max_mb * 1024 * 1024) if args.max_mb else None, log=log)
+    try:
+        with profiling.capturar_perfil(args.saida, args.profile or profiling.perfil_ativo(),
+                                       args.tracemalloc or profiling.memoria_ativa(), log=print):
+            message = job.run()
+    except Exception as e:
+        print(f"ERRO: Erro crítico no processamento: {e}", file=sys.stderr)
+        return 2
+
+    print(message)
+    print(f"Planilha: {len(df)} peça(s) lidas em {tempo_leitura:.2f} s")
+    print(f"Total: {time.perf_counter() - inicio:.2f} s com {job.workers} processo(s)")
+
+    if job.falhas:
+        print(f"{job.falhas} peça(s) com falha.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
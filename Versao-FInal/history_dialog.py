@@ -1,8 +1,10 @@
 # history_dialog.py
 
+import sqlite3
 from PyQt5.QtWidgets import (QDialog, QHBoxLayout, QVBoxLayout, QGroupBox, 
-                             QListWidget, QTableWidget, QTableWidgetItem, 
+                             QTreeWidget, QTreeWidgetItem, QTableWidget, QTableWidgetItem, 
                              QPushButton, QMessageBox)
+from PyQt5.QtCore import Qt
 
 # A ÚNICA importação de outro módulo do nosso projeto deve ser esta:
 from history_manager import HistoryManager
@@ -13,14 +15,17 @@ class HistoryDialog(QDialog):
         self.setWindowTitle("Histórico de Projetos")
         self.history_manager = history_manager
         self.loaded_project_data = None
-        self.setMinimumSize(800, 600)
+        self.setMinimumSize(1000, 600)
 
         layout = QHBoxLayout(self)
 
-        # Painel esquerdo com a lista de projetos
+        # Painel esquerdo com a lista de projetos (só o resumo; as peças são lidas ao selecionar)
         left_panel = QGroupBox("Projetos Salvos")
         left_layout = QVBoxLayout()
-        self.project_list_widget = QListWidget()
+        self.project_list_widget = QTreeWidget()
+        self.project_list_widget.setRootIsDecorated(False)
+        self.project_list_widget.setUniformRowHeights(True)
+        self.project_list_widget.setHeaderLabels(["Projeto", "Salvo em", "Peças", "Qtd. Total", "Espessuras (mm)"])
         left_layout.addWidget(self.project_list_widget)
         left_panel.setLayout(left_layout)
 
@@ -42,7 +47,7 @@ class HistoryDialog(QDialog):
         right_layout.addLayout(button_layout)
         right_panel.setLayout(right_layout)
 
-        layout.addWidget(left_panel, 1)
+        layout.addWidget(left_panel, 2)
         layout.addWidget(right_panel, 3)
         
         # Conexões
@@ -57,8 +62,18 @@ class HistoryDialog(QDialog):
 
     def populate_project_list(self):
         self.project_list_widget.clear()
-        projects = self.history_manager.get_projects()
-        self.project_list_widget.addItems(projects)
+        items = []
+        for summary in self.history_manager.get_project_summaries():
+            total = summary['total_quantity']
+            item = QTreeWidgetItem([summary['project_number'], summary['save_date'] or '-',
+                                    str(summary['piece_count']), f"{total:g}" if total is not None else '-',
+                                    summary['thicknesses'] or '-'])
+            for coluna in (2, 3):
+                item.setTextAlignment(coluna, Qt.AlignRight | Qt.AlignVCenter)
+            items.append(item)
+        self.project_list_widget.addTopLevelItems(items)
+        for coluna in range(self.project_list_widget.columnCount()):
+            self.project_list_widget.resizeColumnToContents(coluna)
 
     def display_project_details(self, current, previous):
         self.pieces_table_widget.setRowCount(0)
@@ -66,7 +81,7 @@ class HistoryDialog(QDialog):
             self.update_buttons_state()
             return
 
-        project_number = current.text()
+        project_number = current.text(0)
         pieces = self.history_manager.get_project_data(project_number)
 
         if pieces:
@@ -95,17 +110,20 @@ class HistoryDialog(QDialog):
 
     def load_project(self):
         if self.project_list_widget.currentItem():
-            project_number = self.project_list_widget.currentItem().text()
+            project_number = self.project_list_widget.currentItem().text(0)
             self.loaded_project_data = self.history_manager.get_project_data(project_number)
             self.accept()
 
     def delete_project(self):
         if self.project_list_widget.currentItem():
-            project_number = self.project_list_widget.currentItem().text()
+            project_number = self.project_list_widget.currentItem().text(0)
             reply = QMessageBox.question(self, 'Excluir Projeto', 
                                          f"Tem certeza que deseja excluir o projeto '{project_number}' do histórico?", 
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                self.history_manager.delete_project(project_number)
+                try:
+                    self.history_manager.delete_project(project_number)
+                except sqlite3.Error as e:
+                    QMessageBox.critical(self, "Erro ao Excluir", f"Não foi possível excluir o projeto do histórico: {e}"); return
                 self.populate_project_list()
                 self.pieces_table_widget.setRowCount(0)
\ No newline at end of file
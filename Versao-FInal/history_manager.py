@@ -1,50 +1,160 @@
 # history_manager.py
 
+import os
 import json
+import math
+import sqlite3
 from datetime import datetime
+from PyQt5.QtWidgets import QMessageBox
+
+from banco_sqlite import FORMATO_DATA, conectar, transacao
+
+def _numero(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(numero) else numero
+
+def resumo_pecas(pieces_list):
+    """(qtd_pecas, qtd_total, espessuras) de uma lista de peças; espessuras em texto, ex.: '2, 3.5'."""
+    quantidades = [_numero(piece.get('qtd')) for piece in pieces_list]
+    espessuras = {_numero(piece.get('espessura')) for piece in pieces_list} - {None}
+    qtd_total = sum(qtd for qtd in quantidades if qtd is not None)
+    return len(pieces_list), qtd_total, ", ".join(f"{espessura:g}" for espessura in sorted(espessuras))
 
 class HistoryManager:
     """
-    Gerencia o histórico de projetos, salvando e carregando dados de um arquivo JSON.
+    Gerencia o histórico de projetos em um banco SQLite (modo WAL): uma linha por projeto
+    e uma por peça, com gravação e exclusão de cada projeto em uma transação própria.
+    A linha do projeto guarda também um resumo (quantidade de peças, quantidade total e
+    espessuras), para listar os projetos sem ler as peças.
+    Na primeira abertura, o histórico antigo em JSON é importado.
+    Se o banco não puder ser aberto (pasta sem permissão, banco travado), o histórico
+    fica vazio nesta sessão e as gravações levantam sqlite3.OperationalError.
     """
-    def __init__(self, history_path="project_history.json"):
-        self.history_path = history_path
-
-    def _load_history(self):
+    def __init__(self, db_path="project_history.db", legacy_json_path="project_history.json"):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self.conn = None
         try:
-            with open(self.history_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            self._open_database()
+        except (sqlite3.Error, OSError) as e:
+            self.close()
+            QMessageBox.warning(None, "Erro de Leitura", f"Não foi possível abrir o histórico de projetos '{self.db_path}': {e}")
+
+    def _open_database(self):
+        self.conn = conectar(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS projetos (
+                numero TEXT PRIMARY KEY,
+                data_salvo TEXT,
+                qtd_pecas INTEGER,
+                qtd_total REAL,
+                espessuras TEXT
+            );
+            CREATE TABLE IF NOT EXISTS pecas (
+                projeto TEXT NOT NULL REFERENCES projetos (numero) ON DELETE CASCADE,
+                ordem INTEGER NOT NULL,
+                nome_arquivo TEXT,
+                dados TEXT NOT NULL,
+                PRIMARY KEY (projeto, ordem)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+        """)
+        self._migrate_schema()
+        self._import_legacy_json()
 
-    def _save_history(self, history_data):
-        with open(self.history_path, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, indent=4)
+    def _migrate_schema(self):
+        """Bancos sem as colunas de resumo ganham as colunas; projetos ainda sem resumo são resumidos uma vez."""
+        colunas = {linha[1] for linha in self.conn.execute("PRAGMA table_info(projetos)")}
+        with transacao(self.conn):
+            for coluna, tipo in (('qtd_pecas', 'INTEGER'), ('qtd_total', 'REAL'), ('espessuras', 'TEXT')):
+                if coluna not in colunas:
+                    self.conn.execute(f"ALTER TABLE projetos ADD COLUMN {coluna} {tipo}")
+            sem_resumo = [linha[0] for linha in self.conn.execute("SELECT numero FROM projetos WHERE qtd_pecas IS NULL")]
+            for project_number in sem_resumo:
+                self.conn.execute("UPDATE projetos SET qtd_pecas = ?, qtd_total = ?, espessuras = ? WHERE numero = ?",
+                                  (*resumo_pecas(self.get_project_data(project_number)), project_number))
+
+    def _import_legacy_json(self):
+        """Importa o project_history.json uma única vez; o arquivo antigo fica intocado como cópia."""
+        if self.conn.execute("SELECT 1 FROM meta WHERE chave = 'importado_json'").fetchone():
+            return
+        history = {}
+        if self.legacy_json_path and os.path.exists(self.legacy_json_path):
+            try:
+                with open(self.legacy_json_path, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Histórico antigo '{self.legacy_json_path}' ilegível, não importado: {e}")
+        with transacao(self.conn):
+            for project_number, project in history.items():
+                self._write_project(project_number, project.get('save_date'), project.get('pieces', []))
+            self.conn.execute("INSERT INTO meta (chave, valor) VALUES ('importado_json', ?)", (datetime.now().strftime(FORMATO_DATA),))
+        if history:
+            print(f"{len(history)} projeto(s) importado(s) de '{self.legacy_json_path}' para '{self.db_path}'.")
+
+    def _write_project(self, project_number, save_date, pieces_list):
+        """Substitui o projeto e todas as suas peças (deve rodar dentro de uma transação)."""
+        self.conn.execute("INSERT INTO projetos (numero, data_salvo, qtd_pecas, qtd_total, espessuras) VALUES (?, ?, ?, ?, ?) "
+                          "ON CONFLICT(numero) DO UPDATE SET data_salvo = excluded.data_salvo, qtd_pecas = excluded.qtd_pecas, "
+                          "qtd_total = excluded.qtd_total, espessuras = excluded.espessuras",
+                          (project_number, save_date, *resumo_pecas(pieces_list)))
+        self.conn.execute("DELETE FROM pecas WHERE projeto = ?", (project_number,))
+        self.conn.executemany("INSERT INTO pecas (projeto, ordem, nome_arquivo, dados) VALUES (?, ?, ?, ?)",
+                              [(project_number, ordem, piece.get('nome_arquivo'), json.dumps(piece, ensure_ascii=False))
+                               for ordem, piece in enumerate(pieces_list)])
+
+    def _require_connection(self):
+        if self.conn is None:
+            raise sqlite3.OperationalError(f"O histórico de projetos '{self.db_path}' não está disponível.")
 
     def get_projects(self):
-        return sorted(self._load_history().keys())
+        if self.conn is None:
+            return []
+        return [linha[0] for linha in self.conn.execute("SELECT numero FROM projetos ORDER BY numero")]
+
+    def get_project_summaries(self):
+        """
+        Resumo de cada projeto, em ordem de número, lido só da tabela de projetos:
+        dicts com 'project_number', 'save_date', 'piece_count', 'total_quantity' e 'thicknesses'.
+        """
+        if self.conn is None:
+            return []
+        return [{'project_number': numero, 'save_date': data_salvo, 'piece_count': qtd_pecas,
+                 'total_quantity': qtd_total, 'thicknesses': espessuras}
+                for numero, data_salvo, qtd_pecas, qtd_total, espessuras in
+                self.conn.execute("SELECT numero, data_salvo, qtd_pecas, qtd_total, espessuras FROM projetos ORDER BY numero")]
 
     def get_project_data(self, project_number):
-        return self._load_history().get(project_number, {}).get('pieces', [])
+        if self.conn is None:
+            return []
+        return [json.loads(dados) for (dados,) in
+                self.conn.execute("SELECT dados FROM pecas WHERE projeto = ? ORDER BY ordem", (project_number,))]
 
     def save_project(self, project_number, pieces_df):
-        history = self._load_history()
         df_copy = pieces_df.copy()
         # Garante que a coluna 'furos' seja uma lista serializável em JSON
         df_copy['furos'] = df_copy['furos'].apply(lambda x: x if isinstance(x, list) else [])
         pieces_list = df_copy.to_dict('records')
-        
-        history[project_number] = {
-            "project_number": project_number,
-            "save_date": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-            "pieces": pieces_list
-        }
-        self._save_history(history)
+        self._require_connection()
+        with transacao(self.conn):
+            self._write_project(project_number, datetime.now().strftime(FORMATO_DATA), pieces_list)
 
     def delete_project(self, project_number):
-        history = self._load_history()
-        if project_number in history:
-            del history[project_number]
-            self._save_history(history)
-            return True
-        return False
\ No newline at end of file
+        self._require_connection()
+        with transacao(self.conn):
+            # As peças saem junto (ON DELETE CASCADE)
+            return self.conn.execute("DELETE FROM projetos WHERE numero = ?", (project_number,)).rowcount > 0
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
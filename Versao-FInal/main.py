@@ -3,19 +3,24 @@
 import sys
 import os
 import json
+import sqlite3
+import multiprocessing
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QTextEdit, 
                              QFileDialog, QProgressBar, QMessageBox, QGroupBox,
                              QFormLayout, QLineEdit, QComboBox, QTableWidget, 
-                             QTableWidgetItem, QDialog, QInputDialog)
+                             QTableWidgetItem, QDialog, QInputDialog, QSpinBox, QCheckBox)
 from PyQt5.QtCore import Qt
 
 # <<< IMPORTAÇÕES DAS CLASSES ENCAPSULADAS >>>
-from code_manager import CodeGenerator
+from code_manager import CodeGenerator, CodePrefetcher
 from history_manager import HistoryManager
 from history_dialog import HistoryDialog
+from code_search_dialog import CodeSearchDialog
 from processing import ProcessThread
+from dxf_engine import MODO_DXF_PECAS, MODO_DXF_CHAPA
+from planilha import COLUNAS_DF, carregar_planilha
 
 # =============================================================================
 # CLASSE PRINCIPAL DA INTERFACE GRÁFICA
@@ -28,10 +33,12 @@ class MainWindow(QMainWindow):
         
         # Instancia as classes dos módulos importados
         self.code_generator = CodeGenerator()
+        # Mantém o próximo código do projeto ativo reservado em segundo plano
+        self.code_prefetcher = CodePrefetcher(self.code_generator, prefix='DES')
         self.history_manager = HistoryManager()
         
         # Variáveis de estado da aplicação
-        self.colunas_df = ['nome_arquivo', 'forma', 'espessura', 'qtd', 'largura', 'altura', 'diametro', 'rt_base', 'rt_height', 'trapezoid_large_base', 'trapezoid_small_base', 'trapezoid_height', 'furos']
+        self.colunas_df = list(COLUNAS_DF)
         self.manual_df = pd.DataFrame(columns=self.colunas_df)
         self.excel_df = pd.DataFrame(columns=self.colunas_df)
         self.furos_atuais = []
@@ -57,6 +64,10 @@ class MainWindow(QMainWindow):
         self.history_btn = QPushButton("Ver Histórico de Projetos")
         project_layout.addWidget(self.start_project_btn)
         project_layout.addWidget(self.history_btn)
+        self.export_codes_btn = QPushButton("Exportar Banco de Códigos (Excel)")
+        project_layout.addWidget(self.export_codes_btn)
+        self.search_codes_btn = QPushButton("Buscar Códigos...")
+        project_layout.addWidget(self.search_codes_btn)
         project_group.setLayout(project_layout)
         left_v_layout.addWidget(project_group)
         
@@ -67,8 +78,11 @@ class MainWindow(QMainWindow):
         file_button_layout = QHBoxLayout()
         self.select_file_btn = QPushButton("Selecionar Planilha")
         self.clear_excel_btn = QPushButton("Limpar Planilha")
+        self.assign_codes_btn = QPushButton("Gerar Códigos p/ Peças sem Nome")
+        self.assign_codes_btn.setToolTip("Reserva de uma vez um código para cada peça da lista que ainda não tem nome.")
         file_button_layout.addWidget(self.select_file_btn)
         file_button_layout.addWidget(self.clear_excel_btn)
+        file_button_layout.addWidget(self.assign_codes_btn)
         file_layout.addWidget(self.file_label)
         file_layout.addLayout(file_button_layout)
         file_group.setLayout(file_layout)
@@ -161,6 +175,21 @@ class MainWindow(QMainWindow):
         process_buttons_layout.addWidget(self.export_excel_btn)
         process_buttons_layout.addWidget(self.conclude_project_btn)
         process_buttons_layout.addStretch()
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(os.cpu_count() or 1)
+        self.workers_spin.setToolTip("Número de processos usados para gerar os arquivos em paralelo.")
+        process_buttons_layout.addWidget(QLabel("Processos:"))
+        process_buttons_layout.addWidget(self.workers_spin)
+        self.dxf_mode_combo = QComboBox()
+        self.dxf_mode_combo.addItem("Um por peça (ZIP)", MODO_DXF_PECAS)
+        self.dxf_mode_combo.addItem("Chapa por espessura", MODO_DXF_CHAPA)
+        self.dxf_mode_combo.setToolTip("Chapa: um DXF por espessura, com cada geometria em um bloco inserido 'Qtd' vezes.")
+        process_buttons_layout.addWidget(QLabel("DXF:"))
+        process_buttons_layout.addWidget(self.dxf_mode_combo)
+        self.ordenar_furos_check = QCheckBox("Otimizar furação")
+        self.ordenar_furos_check.setToolTip("Reordena os furos nos DXFs para reduzir o deslocamento da máquina entre eles.")
+        process_buttons_layout.addWidget(self.ordenar_furos_check)
         process_buttons_layout.addWidget(self.process_pdf_btn)
         process_buttons_layout.addWidget(self.process_dxf_btn)
         process_buttons_layout.addWidget(self.process_all_btn)
@@ -182,9 +211,12 @@ class MainWindow(QMainWindow):
         # --- Conexões de Sinais e Slots (Eventos) ---
         self.start_project_btn.clicked.connect(self.start_new_project)
         self.history_btn.clicked.connect(self.show_history_dialog)
+        self.export_codes_btn.clicked.connect(self.export_codes_to_excel)
+        self.search_codes_btn.clicked.connect(self.show_code_search_dialog)
         self.select_file_btn.clicked.connect(self.select_file)
         self.clear_excel_btn.clicked.connect(self.clear_excel_data)
         self.generate_code_btn.clicked.connect(self.generate_piece_code)
+        self.assign_codes_btn.clicked.connect(self.assign_codes_to_unnamed_pieces)
         self.add_piece_btn.clicked.connect(self.add_manual_piece)
         self.forma_combo.currentTextChanged.connect(self.update_dimension_fields)
         self.replicate_btn.clicked.connect(self.replicate_holes)
@@ -219,6 +251,7 @@ class MainWindow(QMainWindow):
             self._clear_session(clear_project_number=True)
             self.project_directory = project_path
             self.projeto_input.setText(project_name)
+            self.code_prefetcher.set_project(project_name)
             self.dir_label.setText(f"Projeto Ativo: {self.project_directory}")
             self.dir_label.setStyleSheet("font-style: normal; color: black;")
             self.log_text.append(f"\n--- NOVO PROJETO INICIADO: {project_name} ---")
@@ -234,7 +267,7 @@ class MainWindow(QMainWindow):
         has_items = not (self.excel_df.empty and self.manual_df.empty)
         self.process_pdf_btn.setEnabled(is_project_active and has_items); self.process_dxf_btn.setEnabled(is_project_active and has_items)
         self.process_all_btn.setEnabled(is_project_active and has_items); self.conclude_project_btn.setEnabled(is_project_active and has_items)
-        self.export_excel_btn.setEnabled(is_project_active and has_items)
+        self.export_excel_btn.setEnabled(is_project_active and has_items); self.assign_codes_btn.setEnabled(is_project_active and has_items)
         self.progress_bar.setVisible(False)
 
     def show_history_dialog(self):
@@ -243,9 +276,21 @@ class MainWindow(QMainWindow):
             loaded_pieces = dialog.loaded_project_data
             if loaded_pieces:
                 # Tenta obter o número do projeto a partir do primeiro item da lista
-                project_number_loaded = loaded_pieces[0].get('project_number') if loaded_pieces and 'project_number' in loaded_pieces[0] else dialog.project_list_widget.currentItem().text()
+                project_number_loaded = loaded_pieces[0].get('project_number') if loaded_pieces and 'project_number' in loaded_pieces[0] else dialog.project_list_widget.currentItem().text(0)
                 self.start_new_project_from_history(project_number_loaded, loaded_pieces)
     
+    def export_codes_to_excel(self):
+        save_path, _ = QFileDialog.getSaveFileName(self, "Exportar Banco de Códigos", "codigo_database_exportado.xlsx", "Excel Files (*.xlsx)")
+        if not save_path: return
+        try:
+            total = self.code_generator.export_to_xlsx(save_path)
+            self.log_text.append(f"{total} código(s) exportado(s) para '{save_path}'.")
+        except Exception as e:
+            QMessageBox.critical(self, "Erro ao Exportar", f"Não foi possível exportar o banco de códigos: {e}")
+
+    def show_code_search_dialog(self):
+        CodeSearchDialog(self.code_generator, self).exec_()
+
     def start_new_project_from_history(self, project_name, pieces_data):
         parent_dir = QFileDialog.getExistingDirectory(self, f"Selecione uma pasta para o projeto '{project_name}'")
         if not parent_dir: return
@@ -254,6 +299,7 @@ class MainWindow(QMainWindow):
         self._clear_session(clear_project_number=True)
         self.project_directory = project_path
         self.projeto_input.setText(project_name)
+        self.code_prefetcher.set_project(project_name)
         self.excel_df = pd.DataFrame(columns=self.colunas_df)
         self.manual_df = pd.DataFrame(pieces_data)
         self.dir_label.setText(f"Projeto Ativo: {self.project_directory}"); self.dir_label.setStyleSheet("font-style: normal; color: black;")
@@ -272,7 +318,9 @@ class MainWindow(QMainWindow):
         if combined_df.empty: QMessageBox.warning(self, "Aviso", "A lista de peças está vazia."); return
         self.set_buttons_enabled_on_process(False)
         self.progress_bar.setVisible(True); self.progress_bar.setValue(0); self.log_text.clear()
-        self.process_thread = ProcessThread(combined_df.copy(), generate_pdf, generate_dxf, self.project_directory)
+        self.process_thread = ProcessThread(combined_df.copy(), generate_pdf, generate_dxf, self.project_directory,
+                                            workers=self.workers_spin.value(), dxf_mode=self.dxf_mode_combo.currentData(),
+                                            ordenar_furos=self.ordenar_furos_check.isChecked())
         self.process_thread.update_signal.connect(self.log_text.append)
         self.process_thread.progress_signal.connect(self.progress_bar.setValue)
         self.process_thread.finished_signal.connect(self.processing_finished)
@@ -293,7 +341,12 @@ class MainWindow(QMainWindow):
             combined_df = pd.concat([self.excel_df, self.manual_df], ignore_index=True)
             if not combined_df.empty:
                 combined_df['project_number'] = project_number
-                self.history_manager.save_project(project_number, combined_df)
+                try:
+                    self.history_manager.save_project(project_number, combined_df)
+                except sqlite3.Error as e:
+                    # O projeto continua aberto para não perder as peças
+                    QMessageBox.critical(self, "Erro ao Salvar", f"Não foi possível salvar o projeto no histórico: {e}")
+                    return
                 self.log_text.append(f"Projeto '{project_number}' salvo no histórico.")
             self._clear_session(clear_project_number=True)
             self.project_directory = None
@@ -363,6 +416,8 @@ class MainWindow(QMainWindow):
         fields_to_clear = [self.nome_input, self.espessura_input, self.qtd_input, self.largura_input, self.altura_input, self.diametro_input, self.rt_base_input, self.rt_height_input, self.trapezoid_large_base_input, self.trapezoid_small_base_input, self.trapezoid_height_input, self.rep_diam_input, self.rep_offset_input, self.diametro_furo_input, self.pos_x_input, self.pos_y_input]
         if clear_project_number:
             fields_to_clear.append(self.projeto_input)
+            # Projeto encerrado: os códigos pré-reservados e não usados são marcados como liberados (pela thread de pré-reserva)
+            self.code_prefetcher.set_project(None)
         for field in fields_to_clear:
             field.clear()
         self.furos_atuais = []
@@ -389,6 +444,7 @@ class MainWindow(QMainWindow):
         self.process_all_btn.setEnabled(enabled and is_project_active and has_items)
         self.conclude_project_btn.setEnabled(enabled and is_project_active and has_items)
         self.export_excel_btn.setEnabled(enabled and is_project_active and has_items)
+        self.assign_codes_btn.setEnabled(enabled and is_project_active and has_items)
     
     def update_table_display(self):
         self.set_initial_button_state() # Garante que os botões sempre reflitam o estado atual
@@ -460,9 +516,34 @@ class MainWindow(QMainWindow):
     def generate_piece_code(self):
         project_number = self.projeto_input.text().strip()
         if not project_number: QMessageBox.warning(self, "Campo Obrigatório", "Inicie um projeto para definir o 'Nº do Projeto'."); return
-        new_code = self.code_generator.generate_new_code(project_number, prefix='DES')
+        new_code = self.code_prefetcher.take(project_number)
+        if new_code is None:
+            # Estoque ainda vazio (ou banco indisponível em segundo plano): reserva na hora
+            new_code = self.code_generator.generate_new_code(project_number, prefix='DES')
         if new_code: self.nome_input.setText(new_code); self.log_text.append(f"Código '{new_code}' gerado para o projeto '{project_number}'.")
     
+    def assign_codes_to_unnamed_pieces(self):
+        project_number = self.projeto_input.text().strip()
+        if not project_number: QMessageBox.warning(self, "Campo Obrigatório", "Inicie um projeto para definir o 'Nº do Projeto'."); return
+        sem_nome = {}
+        for nome_df in ('excel_df', 'manual_df'):
+            df = getattr(self, nome_df)
+            nomes = df['nome_arquivo'].astype('string').str.strip()
+            sem_nome[nome_df] = df.index[nomes.isna() | (nomes == '')]
+        total = sum(len(indices) for indices in sem_nome.values())
+        if total == 0:
+            QMessageBox.information(self, "Códigos", "Todas as peças da lista já têm nome."); return
+        codes = self.code_generator.reserve_codes(project_number, total, prefix='DES')
+        if not codes: return
+        inicio = 0
+        for nome_df, indices in sem_nome.items():
+            df = getattr(self, nome_df)
+            df['nome_arquivo'] = df['nome_arquivo'].astype(object)
+            df.loc[indices, 'nome_arquivo'] = codes[inicio:inicio + len(indices)]
+            inicio += len(indices)
+        self.log_text.append(f"{total} código(s) gerado(s) para o projeto '{project_number}': {codes[0]} a {codes[-1]}.")
+        self.update_table_display()
+
     def add_manual_piece(self):
         try:
             nome = self.nome_input.text().strip()
@@ -487,21 +568,7 @@ class MainWindow(QMainWindow):
         file_path, _ = QFileDialog.getOpenFileName(self, "Selecionar Planilha", "", "Excel Files (*.xlsx *.xls)")
         if file_path:
             try:
-                df = pd.read_excel(file_path, header=0, decimal=','); df.columns = df.columns.str.strip().str.lower()
-                df = df.loc[:, ~df.columns.duplicated()]
-                for col in self.colunas_df:
-                    if col not in df.columns: df[col] = pd.NA
-                if 'furos' in df.columns:
-                    def parse_furos(x):
-                        if isinstance(x, list): return x
-                        if isinstance(x, str) and x.startswith('['):
-                            try: return json.loads(x.replace("'", "\""))
-                            except json.JSONDecodeError: return []
-                        return []
-                    df['furos'] = df['furos'].apply(parse_furos)
-                else:
-                    df['furos'] = [[] for _ in range(len(df))]
-                self.excel_df = df[self.colunas_df]
+                self.excel_df = carregar_planilha(file_path)
                 self.file_label.setText(f"Planilha: {os.path.basename(file_path)}"); self.update_table_display()
             except Exception as e: QMessageBox.critical(self, "Erro de Leitura", f"Falha ao ler o arquivo: {e}")
     
@@ -550,6 +617,13 @@ class MainWindow(QMainWindow):
         del self.furos_atuais[row_index]
         self.update_furos_table()
 
+    def closeEvent(self, event):
+        # Libera os códigos pré-reservados e grava os pendentes da concessão antes de sair
+        self.code_prefetcher.stop()
+        self.code_generator.close()
+        self.history_manager.close()
+        super().closeEvent(event)
+
 # =============================================================================
 # PONTO DE ENTRADA DA APLICAÇÃO
 # =============================================================================
@@ -560,4 +634,6 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # Necessário para o ProcessPoolExecutor em executáveis congelados no Windows
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+# metrics.py
+
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+def percentil(valores_ordenados, fracao):
+    """Percentil pelo método do posto mais próximo; a lista já deve estar ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(fracao * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+class RunMetrics:
+    """
+    Coleta os tempos de uma execução de geração: tempo acumulado por etapa
+    (preparação, desenho, gravação, compactação...), latência de cada peça e bytes
+    gravados por saída. O custo por medição é apenas uma chamada a perf_counter.
+    """
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.inicio = datetime.now()
+        self._inicio_perf = time.perf_counter()
+        # Soma dos tempos de cada etapa (em processos paralelos, pode passar do tempo real)
+        self.etapas = {}
+        # Tempo real (relógio de parede) de cada saída: 'pdf' e 'dxf'
+        self.duracao_saidas = {}
+        self.pecas = {}
+        self.latencias = {}
+        self.bytes_gravados = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.adicionar_tempo(nome, time.perf_counter() - inicio)
+
+    def adicionar_tempo(self, nome, segundos):
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    def adicionar_tempos(self, tempos):
+        """Soma um dicionário {etapa: segundos}, por exemplo vindo de um processo worker."""
+        for nome, segundos in tempos.items():
+            self.adicionar_tempo(nome, segundos)
+
+    def registrar_latencias(self, saida, segundos):
+        self.latencias.setdefault(saida, []).extend(segundos)
+
+    def registrar_bytes(self, saida, quantidade):
+        self.bytes_gravados[saida] = self.bytes_gravados.get(saida, 0) + quantidade
+
+    def registrar_saida(self, saida, pecas, segundos):
+        self.pecas[saida] = pecas
+        self.duracao_saidas[saida] = segundos
+
+    def resumo(self):
+        dados = {
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'duracao_total_s': round(time.perf_counter() - self._inicio_perf, 4),
+            'workers': self.workers,
+            'etapas_s': {nome: round(segundos, 4) for nome, segundos in self.etapas.items()},
+        }
+        for saida, segundos in self.duracao_saidas.items():
+            latencias = sorted(self.latencias.get(saida, []))
+            pecas = self.pecas.get(saida, 0)
+            dados[saida] = {
+                'pecas': pecas,
+                'pecas_geradas': len(latencias),
+                'duracao_s': round(segundos, 4),
+                'pecas_por_s': round(pecas / segundos, 2) if segundos > 0 else None,
+                'latencia_p50_ms': round(percentil(latencias, 0.50) * 1000, 3),
+                'latencia_p95_ms': round(percentil(latencias, 0.95) * 1000, 3),
+                'bytes_gravados': self.bytes_gravados.get(saida, 0),
+            }
+        return dados
+
+    def salvar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.resumo(), f, indent=4)
+
+    def linhas_resumo(self):
+        """Resumo curto para o log da interface e da linha de comando."""
+        dados = self.resumo()
+        linhas = []
+        for saida in ('pdf', 'dxf'):
+            if saida in dados:
+                d = dados[saida]
+                taxa = f"{d['pecas_por_s']:.1f}" if d['pecas_por_s'] is not None else "-"
+                linhas.append(f"{saida.upper()}: {d['pecas']} peça(s) em {d['duracao_s']:.2f} s ({taxa} peças/s, "
+                              f"p50 {d['latencia_p50_ms']:.1f} ms, p95 {d['latencia_p95_ms']:.1f} ms, {d['bytes_gravados'] / 1024:.0f} KB)")
+        etapas = ", ".join(f"{nome} {segundos:.2f} s" for nome, segundos in dados['etapas_s'].items())
+        if etapas:
+            linhas.append(f"Etapas: {etapas}")
+        return linhas
@@ -0,0 +1,224 @@
+# ordem_furos.py
+
+import math
+
+# Versão da heurística; entra na chave do cache dos DXFs com furos reordenados
+VERSAO_ORDEM = "2"
+# Vizinhos considerados por furo no 2-opt
+VIZINHOS_2OPT = 8
+# Orçamento do 2-opt de uma peça, em unidades de trabalho (cada vizinho avaliado conta 1 e
+# cada inversão conta o tamanho do trecho invertido). Depende só da entrada, então a ordem
+# final é sempre a mesma para os mesmos furos, em qualquer máquina; o vizinho mais próximo
+# sempre roda inteiro.
+ORCAMENTO_2OPT = 2_000_000
+
+def distancia_percurso(pontos, ordem, origem=(0.0, 0.0)):
+    """Distância percorrida saindo da origem e passando pelos pontos na ordem dada (caminho aberto)."""
+    total = 0.0
+    x, y = origem
+    for i in ordem:
+        total += math.hypot(pontos[i][0] - x, pontos[i][1] - y)
+        x, y = pontos[i]
+    return total
+
+# Pontos por célula da grade uniforme usada nas buscas de vizinhos
+PONTOS_POR_CELULA = 2
+# Anéis de células examinados antes de cair para a busca direta entre os furos restantes
+ANEIS_MAXIMOS = 4
+
+def _montar_grade(pontos):
+    """
+    Grade uniforme com cerca de PONTOS_POR_CELULA furos por célula: {(cx, cy): [indices]}.
+    Furos alinhados (uma fila ou coluna) têm área zero; a célula é então dimensionada pela
+    maior extensão, e furos todos no mesmo ponto usam célula de 1 mm.
+    """
+    xs, ys = [p[0] for p in pontos], [p[1] for p in pontos]
+    largura, altura = max(xs) - min(xs), max(ys) - min(ys)
+    tamanho = max(math.sqrt(largura * altura * PONTOS_POR_CELULA / len(pontos)),
+                  max(largura, altura) * PONTOS_POR_CELULA / len(pontos))
+    if tamanho <= 0:
+        tamanho = 1.0
+    grade = {}
+    for i, (x, y) in enumerate(pontos):
+        grade.setdefault((math.floor(x / tamanho), math.floor(y / tamanho)), []).append(i)
+    return grade, tamanho
+
+def _celulas_do_anel(cx, cy, r):
+    if r == 0:
+        yield cx, cy
+        return
+    for dx in range(-r, r + 1):
+        yield cx + dx, cy - r
+        yield cx + dx, cy + r
+    for dy in range(-r + 1, r):
+        yield cx - r, cy + dy
+        yield cx + r, cy + dy
+
+def _vizinho_mais_proximo(pontos, origem):
+    """Percurso guloso: sempre para o furo ainda não visitado mais próximo, buscado pela grade."""
+    grade, tamanho = _montar_grade(pontos)
+    restantes = set(range(len(pontos)))
+    ordem = []
+    x, y = origem
+    while restantes:
+        cx, cy = math.floor(x / tamanho), math.floor(y / tamanho)
+        melhor, melhor_d = None, math.inf
+        r = 0
+        # Um furo num anel mais externo está a pelo menos (r - 1) * tamanho de distância
+        while r <= ANEIS_MAXIMOS and (r - 1) * tamanho < melhor_d:
+            for celula in _celulas_do_anel(cx, cy, r):
+                for i in grade.get(celula, ()):
+                    d = math.hypot(pontos[i][0] - x, pontos[i][1] - y)
+                    if d < melhor_d:
+                        melhor, melhor_d = i, d
+            r += 1
+        if melhor is None or (r - 1) * tamanho < melhor_d:
+            # Vizinhança vazia ou incerta: busca direta entre os restantes
+            melhor = min(restantes, key=lambda i: math.hypot(pontos[i][0] - x, pontos[i][1] - y))
+        ordem.append(melhor)
+        restantes.discard(melhor)
+        x, y = pontos[melhor]
+        grade[(math.floor(x / tamanho), math.floor(y / tamanho))].remove(melhor)
+    return ordem
+
+def _listas_vizinhos(pontos, k):
+    """Os 'k' furos mais próximos de cada furo, em ordem de distância, buscados pela grade."""
+    grade, tamanho = _montar_grade(pontos)
+    k = min(k, len(pontos) - 1)
+    listas = []
+    for i, (x, y) in enumerate(pontos):
+        cx, cy = math.floor(x / tamanho), math.floor(y / tamanho)
+        candidatos = []
+        r = 0
+        # Para quando já há k candidatos e nenhum anel mais externo pode trazer um mais próximo
+        while k and r <= ANEIS_MAXIMOS and (len(candidatos) < k or (r - 1) * tamanho < candidatos[k - 1][0]):
+            for celula in _celulas_do_anel(cx, cy, r):
+                for j in grade.get(celula, ()):
+                    if j != i:
+                        candidatos.append((math.hypot(pontos[j][0] - x, pontos[j][1] - y), j))
+            candidatos.sort()
+            r += 1
+        if k and (len(candidatos) < k or (r - 1) * tamanho < candidatos[k - 1][0]):
+            # Vizinhança incompleta ou incerta: busca direta entre todos os furos
+            candidatos = sorted((math.hypot(pontos[j][0] - x, pontos[j][1] - y), j)
+                                for j in range(len(pontos)) if j != i)
+        listas.append([j for _, j in candidatos[:k]])
+    return listas
+
+def _inverter(tour, pos, inicio, fim):
+    """Inverte tour[inicio..fim] (inclusive) e atualiza as posições."""
+    tour[inicio:fim + 1] = tour[inicio:fim + 1][::-1]
+    for p in range(inicio, fim + 1):
+        pos[tour[p]] = p
+
+def _dois_opt(pontos, ordem, origem, k, orcamento):
+    """
+    Melhora o caminho aberto com movimentos 2-opt restritos às listas de vizinhos.
+    A origem é um nó fixo no início; o fim do caminho é livre (sem aresta de volta).
+    """
+    coords = [tuple(origem)] + pontos
+    # Nó 0 é a origem; os furos passam a ser 1..n
+    tour = [0] + [i + 1 for i in ordem]
+    pos = [0] * len(tour)
+    for i, no in enumerate(tour):
+        pos[no] = i
+    vizinhos = [[]] + [[v + 1 for v in lista] for lista in _listas_vizinhos(pontos, k)]
+    ultimo = len(tour) - 1
+
+    def dist(a, b):
+        (xa, ya), (xb, yb) = coords[a], coords[b]
+        return math.hypot(xa - xb, ya - yb)
+
+    trabalho = 0
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for a in range(1, len(tour)):
+            if trabalho > orcamento:
+                return [no - 1 for no in tour[1:]]
+            trabalho += 2 * k
+            i = pos[a]
+            # Sentido direto: troca (a, suc a) + (c, suc c) por (a, c) + (suc a, suc c)
+            if i < ultimo:
+                b = tour[i + 1]
+                d_ab = dist(a, b)
+                for c in vizinhos[a]:
+                    d_ac = dist(a, c)
+                    if d_ac >= d_ab:
+                        break
+                    j = pos[c]
+                    if j == i + 1:
+                        continue
+                    ganho = d_ab - d_ac
+                    if j < ultimo:
+                        d = tour[j + 1]
+                        ganho += dist(c, d) - dist(b, d)
+                    if ganho > 1e-9:
+                        _inverter(tour, pos, i + 1, j) if j > i else _inverter(tour, pos, j + 1, i)
+                        trabalho += abs(j - i)
+                        melhorou = True
+                        break
+                else:
+                    # Inverter todo o trecho final: (a, suc a) vira (a, último)
+                    c = tour[ultimo]
+                    if ultimo > i + 1 and dist(a, c) < d_ab - 1e-9:
+                        _inverter(tour, pos, i + 1, ultimo)
+                        trabalho += ultimo - i
+                        melhorou = True
+                if melhorou:
+                    continue
+            # Sentido inverso: troca (ant a, a) + (ant c, c) por (a, c) + (ant a, ant c)
+            b = tour[i - 1]
+            d_ab = dist(a, b)
+            for c in vizinhos[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                j = pos[c]
+                if j == i - 1:
+                    continue
+                d = tour[j - 1]
+                ganho = d_ab + dist(c, d) - d_ac - dist(b, d)
+                if ganho > 1e-9:
+                    _inverter(tour, pos, i, j - 1) if j > i else _inverter(tour, pos, j, i - 1)
+                    trabalho += abs(j - i)
+                    melhorou = True
+                    break
+    return [no - 1 for no in tour[1:]]
+
+def otimizar_ordem(pontos, origem=(0.0, 0.0), orcamento=ORCAMENTO_2OPT):
+    """
+    Ordem de furação dos pontos [(x, y), ...] partindo da origem: vizinho mais próximo
+    seguido de 2-opt com listas de vizinhos. Retorna (ordem, distancia_antes, distancia_depois),
+    com 'ordem' como lista de índices e as distâncias do percurso original e do otimizado.
+    """
+    pontos = [(float(x), float(y)) for x, y in pontos]
+    original = list(range(len(pontos)))
+    antes = distancia_percurso(pontos, original, origem)
+    if len(pontos) < 3:
+        ordem = _vizinho_mais_proximo(pontos, origem) if pontos else original
+    else:
+        ordem = _dois_opt(pontos, _vizinho_mais_proximo(pontos, origem), origem, VIZINHOS_2OPT, orcamento)
+    depois = distancia_percurso(pontos, ordem, origem)
+    # A heurística nunca deve piorar a ordem que veio da planilha
+    if depois >= antes:
+        return original, antes, antes
+    return ordem, antes, depois
+
+def ordenar_furos_pecas(pecas):
+    """
+    Reordena os furos de cada peça para reduzir o deslocamento em vazio da máquina.
+    Retorna (pecas_ordenadas, distancia_antes, distancia_depois), com cópias apenas das
+    peças cujos furos mudaram de ordem e as distâncias somadas de todas as peças.
+    """
+    resultado = []
+    total_antes = total_depois = 0.0
+    for peca in pecas:
+        if peca.erro or len(peca.furos) < 2:
+            resultado.append(peca)
+            continue
+        ordem, antes, depois = otimizar_ordem([(furo.x, furo.y) for furo in peca.furos])
+        total_antes += antes
+        total_depois += depois
+        resultado.append(peca.com_furos([peca.furos[i] for i in ordem]) if depois < antes else peca)
+    return resultado, total_antes, total_depois
@@ -1,9 +1,15 @@
 # pdf_generator.py
 
+import time
+# O limite de tamanho por arquivo (max_bytes) lê o atributo interno Canvas._code do ReportLab
+# (conferido na versão 5.0); sem ele, cada página conta só BYTES_FIXOS_POR_PAGINA
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 
+from pieces import Piece
+from validacao import peca_validada
+
 # =============================================================================
 # CONSTANTES GLOBAIS DE LAYOUT DA PÁGINA
 # =============================================================================
@@ -12,6 +18,24 @@ MARGEM_GERAL = 15 * mm
 HEADER_AREA_ALTURA = 25 * mm
 FOOTER_AREA_ALTURA = 25 * mm 
 
+# Quadro do rodapé (nome da peça | espessura | quantidade)
+RODAPE_LARGURA = PAGE_WIDTH - 2 * MARGEM_GERAL
+RODAPE_ALTURA_BLOCO = 12 * mm
+RODAPE_Y = FOOTER_AREA_ALTURA - RODAPE_ALTURA_BLOCO - (5 * mm)
+RODAPE_COLUNA2_X, RODAPE_COLUNA3_X = MARGEM_GERAL + RODAPE_LARGURA * 0.60, MARGEM_GERAL + RODAPE_LARGURA * 0.80
+RODAPE_CENTROS_X = (MARGEM_GERAL + (RODAPE_COLUNA2_X - MARGEM_GERAL)/2,
+                    RODAPE_COLUNA2_X + (RODAPE_COLUNA3_X - RODAPE_COLUNA2_X)/2,
+                    RODAPE_COLUNA3_X + (PAGE_WIDTH - MARGEM_GERAL - RODAPE_COLUNA3_X)/2)
+
+# Acréscimo aproximado de cada página ao arquivo, além do seu conteúdo (objetos, xref...)
+BYTES_FIXOS_POR_PAGINA = 400
+
+# Nome do Form XObject com as partes fixas do cabeçalho e do rodapé
+FORM_MOLDURA = "MolduraPagina"
+
+# Versão do layout gerado; alterar sempre que a saída do PDF mudar (invalida o cache)
+VERSAO_GERADOR = "5"
+
 # =============================================================================
 # FUNÇÕES UTILITÁRIAS E DE DESENHO DE COMPONENTES
 # Estas devem ser definidas ANTES das funções que as usam.
@@ -25,44 +49,45 @@ def formatar_numero(valor):
         return str(int(valor))
     return str(valor).replace('.', ',')
 
+def desenhar_moldura(c):
+    """
+    Desenha as partes fixas do cabeçalho e do rodapé (linhas, quadro, colunas e títulos).
+    Elas são compiladas uma única vez por documento como um Form XObject e apenas
+    referenciadas nas páginas seguintes, o que reduz o conteúdo gravado por página.
+    """
+    if not c.hasForm(FORM_MOLDURA):
+        c.beginForm(FORM_MOLDURA)
+        y_pos_linha = PAGE_HEIGHT - HEADER_AREA_ALTURA
+        c.line(MARGEM_GERAL, y_pos_linha, PAGE_WIDTH - MARGEM_GERAL, y_pos_linha)
+
+        c.setStrokeColorRGB(0, 0, 0)
+        c.rect(MARGEM_GERAL, RODAPE_Y, RODAPE_LARGURA, RODAPE_ALTURA_BLOCO)
+        c.line(RODAPE_COLUNA2_X, RODAPE_Y, RODAPE_COLUNA2_X, RODAPE_Y + RODAPE_ALTURA_BLOCO)
+        c.line(RODAPE_COLUNA3_X, RODAPE_Y, RODAPE_COLUNA3_X, RODAPE_Y + RODAPE_ALTURA_BLOCO)
+
+        c.setFont("Helvetica", 7)
+        y_titulo = RODAPE_Y + RODAPE_ALTURA_BLOCO - 4*mm
+        for centro_x, titulo in zip(RODAPE_CENTROS_X, ("NOME DA PEÇA / IDENTIFICADOR", "ESPESSURA", "QUANTIDADE")):
+            c.drawCentredString(centro_x, y_titulo, titulo)
+        c.endForm()
+    c.doForm(FORM_MOLDURA)
+
 def desenhar_cabecalho(c, nome_arquivo):
     c.setFont("Helvetica-Bold", 14)
     y_pos_texto = PAGE_HEIGHT - HEADER_AREA_ALTURA + (10 * mm)
     c.drawCentredString(PAGE_WIDTH / 2, y_pos_texto, f"Desenho da Peça: {nome_arquivo}")
-    y_pos_linha = PAGE_HEIGHT - HEADER_AREA_ALTURA
-    c.line(MARGEM_GERAL, y_pos_linha, PAGE_WIDTH - MARGEM_GERAL, y_pos_linha)
 
-def desenhar_rodape_aprimorado(c, row):
-    largura_total = PAGE_WIDTH - 2 * MARGEM_GERAL
-    altura_bloco = 12 * mm
-    y_rodape = FOOTER_AREA_ALTURA - altura_bloco - (5 * mm)
-    c.setStrokeColorRGB(0, 0, 0)
-    c.rect(MARGEM_GERAL, y_rodape, largura_total, altura_bloco)
-    
-    coluna1_x, coluna2_x, coluna3_x = MARGEM_GERAL, MARGEM_GERAL + largura_total * 0.60, MARGEM_GERAL + largura_total * 0.80
-    c.line(coluna2_x, y_rodape, coluna2_x, y_rodape + altura_bloco)
-    c.line(coluna3_x, y_rodape, coluna3_x, y_rodape + altura_bloco)
-    
-    y_titulo, y_valor = y_rodape + altura_bloco - 4*mm, y_rodape + 4*mm
-    
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(coluna1_x + (coluna2_x - coluna1_x)/2, y_titulo, "NOME DA PEÇA / IDENTIFICADOR")
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(coluna1_x + (coluna2_x - coluna1_x)/2, y_valor, str(row.get('nome_arquivo', 'N/A')))
-    
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(coluna2_x + (coluna3_x - coluna2_x)/2, y_titulo, "ESPESSURA")
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(coluna2_x + (coluna3_x - coluna2_x)/2, y_valor, f"{formatar_numero(row.get('espessura', 0))} mm")
-    
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(coluna3_x + (PAGE_WIDTH - MARGEM_GERAL - coluna3_x)/2, y_titulo, "QUANTIDADE")
+def desenhar_rodape_aprimorado(c, peca):
+    """Preenche os campos variáveis do rodapé; o quadro e os títulos vêm de desenhar_moldura."""
+    y_valor = RODAPE_Y + 4*mm
+    valores = (str(peca.nome_arquivo or 'N/A'), f"{formatar_numero(peca.espessura)} mm", formatar_numero(peca.qtd))
     c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(coluna3_x + (PAGE_WIDTH - MARGEM_GERAL - coluna3_x)/2, y_valor, formatar_numero(row.get('qtd', 0)))
+    for centro_x, valor in zip(RODAPE_CENTROS_X, valores):
+        c.drawCentredString(centro_x, y_valor, valor)
 
-def desenhar_erro_dados(c, forma):
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(A4[0]/2, A4[1]/2, f"Dados inválidos para a forma: '{forma}'")
+def desenhar_erro_dados(c, mensagem):
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(A4[0]/2, A4[1]/2, mensagem)
 
 def desenhar_cota_horizontal(c, x1, x2, y, texto):
     FONT_NAME, FONT_SIZE = "Helvetica", 10
@@ -117,10 +142,8 @@ def desenhar_cota_diametro_furo(c, x, y, raio, diametro_real):
 # FUNÇÕES DE DESENHO PARA CADA FORMA GEOMÉTRICA
 # =============================================================================
 
-def desenhar_retangulo(c, row):
-    largura, altura = row.get('largura', 0), row.get('altura', 0)
-    if largura <= 0 or altura <= 0: desenhar_erro_dados(c, "Retângulo"); return
-    
+def desenhar_retangulo(c, peca):
+    largura, altura = peca.largura, peca.altura
     max_w, max_h = PAGE_WIDTH - 2*MARGEM_GERAL, PAGE_HEIGHT - HEADER_AREA_ALTURA - FOOTER_AREA_ALTURA
     dist_cota_furo, dist_cota_total, overshoot = 8*mm, 16*mm, 2*mm
     espaco_cota_x, espaco_cota_y = dist_cota_total, dist_cota_total
@@ -134,24 +157,24 @@ def desenhar_retangulo(c, row):
     x0, y0 = inicio_bloco_x + espaco_cota_x, inicio_bloco_y + espaco_cota_y
     c.rect(x0, y0, dw, dh)
     
-    furos = row.get('furos')
-    if isinstance(furos, list) and furos:
-        for furo in furos: c.circle(x0 + (furo['x']*escala), y0 + (furo['y']*escala), (furo['diam']/2)*escala, stroke=1, fill=0)
+    furos = peca.furos
+    if furos:
+        for furo in furos: c.circle(x0 + (furo.x*escala), y0 + (furo.y*escala), (furo.diam/2)*escala, stroke=1, fill=0)
         y_pos_cota = y0 - dist_cota_furo
-        unique_x = sorted(list(set(f['x'] for f in furos)))
+        unique_x = sorted(list(set(f.x for f in furos)))
         dim_points_x = [0] + unique_x + [largura]
         for x_real in dim_points_x: c.line(x0 + x_real*escala, y0, x0 + x_real*escala, y_pos_cota - overshoot)
         for i in range(1, len(dim_points_x)):
             start_x, end_x = dim_points_x[i-1], dim_points_x[i]
             if (end_x - start_x)>0.01: desenhar_cota_horizontal(c, x0+start_x*escala, x0+end_x*escala, y_pos_cota, formatar_numero(end_x-start_x))
         x_pos_cota = x0 - dist_cota_furo
-        unique_y = sorted(list(set(f['y'] for f in furos)))
+        unique_y = sorted(list(set(f.y for f in furos)))
         dim_points_y = [0] + unique_y + [altura]
         for y_real in dim_points_y: c.line(x0, y0 + y_real*escala, x_pos_cota - overshoot, y0 + y_real*escala)
         for i in range(1, len(dim_points_y)):
             start_y, end_y = dim_points_y[i-1], dim_points_y[i]
             if (end_y - start_y)>0.01: desenhar_cota_vertical(c, y0+start_y*escala, y0+end_y*escala, x_pos_cota, formatar_numero(end_y-start_y))
-        desenhar_cota_diametro_furo(c, x0+furos[0]['x']*escala, y0+furos[0]['y']*escala, (furos[0]['diam']/2)*escala, furos[0]['diam'])
+        desenhar_cota_diametro_furo(c, x0+furos[0].x*escala, y0+furos[0].y*escala, (furos[0].diam/2)*escala, furos[0].diam)
         
     y_cota_total = y0 - dist_cota_total
     c.line(x0, y0, x0, y_cota_total-overshoot)
@@ -163,10 +186,8 @@ def desenhar_retangulo(c, row):
     c.line(x0, y0+dh, x_cota_total-overshoot, y0+dh)
     desenhar_cota_vertical(c, y0, y0+dh, x_cota_total, formatar_numero(altura))
 
-def desenhar_circulo(c, row):
-    diametro = row.get('diametro', 0)
-    if diametro <= 0: desenhar_erro_dados(c, "Círculo"); return
-    
+def desenhar_circulo(c, peca):
+    diametro = peca.diametro
     max_w, max_h = PAGE_WIDTH-2*MARGEM_GERAL, PAGE_HEIGHT-HEADER_AREA_ALTURA-FOOTER_AREA_ALTURA
     dist_cota, overshoot = 8*mm, 2*mm
     escala = min((max_w-dist_cota*2)/diametro, (max_h-dist_cota*2)/diametro)*0.95
@@ -177,20 +198,18 @@ def desenhar_circulo(c, row):
     cx, cy = inicio_bloco_x+dist_cota+raio_desenhado, inicio_bloco_y+dist_cota+raio_desenhado
     c.circle(cx, cy, raio_desenhado, stroke=1, fill=0)
     
-    furos = row.get('furos')
-    if isinstance(furos, list) and furos:
+    furos = peca.furos
+    if furos:
         x0_peca, y0_peca = cx-raio_desenhado, cy-raio_desenhado
-        for furo in furos: c.circle(x0_peca+(furo['x']*escala), y0_peca+(furo['y']*escala), (furo['diam']/2)*escala, stroke=1, fill=0)
+        for furo in furos: c.circle(x0_peca+(furo.x*escala), y0_peca+(furo.y*escala), (furo.diam/2)*escala, stroke=1, fill=0)
         
     y_cota_h = cy-raio_desenhado-dist_cota
     c.line(cx-raio_desenhado, cy-raio_desenhado, cx-raio_desenhado, y_cota_h-overshoot)
     c.line(cx+raio_desenhado, cy-raio_desenhado, cx+raio_desenhado, y_cota_h-overshoot)
     desenhar_cota_horizontal(c, cx-raio_desenhado, cx+raio_desenhado, y_cota_h, f"Ø {formatar_numero(diametro)}")
 
-def desenhar_triangulo_retangulo(c, row):
-    base, altura = row.get('rt_base', 0), row.get('rt_height', 0)
-    if base <= 0 or altura <= 0: desenhar_erro_dados(c, "Triângulo Retângulo"); return
-    
+def desenhar_triangulo_retangulo(c, peca):
+    base, altura = peca.rt_base, peca.rt_height
     max_w, max_h = PAGE_WIDTH-2*MARGEM_GERAL, PAGE_HEIGHT-HEADER_AREA_ALTURA-FOOTER_AREA_ALTURA
     dist_cota, overshoot = 8*mm, 2*mm
     espaco_cota_x, espaco_cota_y = dist_cota, dist_cota
@@ -207,9 +226,9 @@ def desenhar_triangulo_retangulo(c, row):
     path.close()
     c.drawPath(path)
     
-    furos = row.get('furos')
-    if isinstance(furos, list) and furos:
-        for furo in furos: c.circle(x0+(furo['x']*escala), y0+(furo['y']*escala), (furo['diam']/2)*escala, stroke=1, fill=0)
+    furos = peca.furos
+    if furos:
+        for furo in furos: c.circle(x0+(furo.x*escala), y0+(furo.y*escala), (furo.diam/2)*escala, stroke=1, fill=0)
         
     y_cota_h = y0 - dist_cota
     c.line(x0, y0, x0, y_cota_h-overshoot)
@@ -221,10 +240,8 @@ def desenhar_triangulo_retangulo(c, row):
     c.line(x0, y0+dh, x_cota_v-overshoot, y0+dh)
     desenhar_cota_vertical(c, y0, y0+dh, x_cota_v, formatar_numero(altura))
 
-def desenhar_trapezio(c, row):
-    large_base, small_base, height = row.get('trapezoid_large_base', 0), row.get('trapezoid_small_base', 0), row.get('trapezoid_height', 0)
-    if large_base<=0 or height<=0 or small_base<=0: desenhar_erro_dados(c, "Trapézio"); return
-    
+def desenhar_trapezio(c, peca):
+    large_base, small_base, height = peca.trapezoid_large_base, peca.trapezoid_small_base, peca.trapezoid_height
     max_w, max_h = PAGE_WIDTH-2*MARGEM_GERAL, PAGE_HEIGHT-HEADER_AREA_ALTURA-FOOTER_AREA_ALTURA
     dist_cota, overshoot = 8*mm, 2*mm
     espaco_cota_x, espaco_cota_y = dist_cota, dist_cota*2
@@ -244,9 +261,9 @@ def desenhar_trapezio(c, row):
     path.close()
     c.drawPath(path)
     
-    furos = row.get('furos')
-    if isinstance(furos, list) and furos:
-        for furo in furos: c.circle(x0+(furo['x']*escala), y0+(furo['y']*escala), (furo['diam']/2)*escala, stroke=1, fill=0)
+    furos = peca.furos
+    if furos:
+        for furo in furos: c.circle(x0+(furo.x*escala), y0+(furo.y*escala), (furo.diam/2)*escala, stroke=1, fill=0)
         
     y_cota_h1 = y0 - dist_cota
     c.line(p1[0], p1[1], p1[0], y_cota_h1-overshoot)
@@ -268,23 +285,81 @@ def desenhar_trapezio(c, row):
 # Esta função chama as outras, por isso deve vir por último.
 # =============================================================================
 
-def desenhar_forma(c, row):
+def desenhar_forma(c, peca, nome_geometria=None):
     """
     Função principal que desenha o cabeçalho, rodapé e a forma geométrica correta.
+    Aceita uma Piece ou, por compatibilidade, uma linha (dict/Series) da lista de peças.
+    Com 'nome_geometria', a forma e as cotas são gravadas uma única vez no documento
+    como um Form XObject e reaproveitadas por todas as peças de geometria idêntica.
     """
-    desenhar_cabecalho(c, row.get('nome_arquivo', 'SEM NOME'))
-    desenhar_rodape_aprimorado(c, row)
-    
-    forma = str(row.get('forma', '')).strip().lower()
+    if not isinstance(peca, Piece):
+        peca = peca_validada(peca)
+    desenhar_moldura(c)
+    desenhar_cabecalho(c, peca.nome_arquivo or 'SEM NOME')
+    desenhar_rodape_aprimorado(c, peca)
+
+    if nome_geometria:
+        if not c.hasForm(nome_geometria):
+            c.beginForm(nome_geometria)
+            desenhar_geometria(c, peca)
+            c.endForm()
+        c.doForm(nome_geometria)
+    else:
+        desenhar_geometria(c, peca)
+
+def desenhar_geometria(c, peca):
+    """
+    Desenha o contorno, os furos e as cotas da peça (tudo que depende só da geometria).
+    Peças recusadas na validação recebem apenas a mensagem de erro no lugar do desenho.
+    """
+    forma = peca.forma
     
-    if forma == 'rectangle':
-        desenhar_retangulo(c, row)
+    if peca.erro:
+        desenhar_erro_dados(c, peca.erro)
+    elif forma == 'rectangle':
+        desenhar_retangulo(c, peca)
     elif forma == 'circle':
-        desenhar_circulo(c, row)
+        desenhar_circulo(c, peca)
     elif forma == 'right_triangle':
-        desenhar_triangulo_retangulo(c, row)
+        desenhar_triangulo_retangulo(c, peca)
     elif forma == 'trapezoid':
-        desenhar_trapezio(c, row)
+        desenhar_trapezio(c, peca)
     else:
         c.setFont("Helvetica", 12)
         c.drawCentredString(A4[0]/2, A4[1]/2, f"Forma '{forma}' desconhecida ou não implementada.")
+
+def _tamanho_pagina_estimado(c):
+    # O ReportLab só conhece o tamanho do arquivo em c.save(). A estimativa usa o conteúdo
+    # ainda não comprimido da página atual mais um valor fixo por página; não conta os Form
+    # XObjects nem a compressão, então o tamanho real das partes pode ficar bem diferente
+    # de 'max_bytes' (em geral menor).
+    return sum(len(operador) for operador in getattr(c, '_code', ())) + BYTES_FIXOS_POR_PAGINA
+
+def gerar_pdf_espessura(nome_parte, pecas, invariant=None, nomes_geometria=None, max_bytes=None):
+    """
+    Uma página por peça em nome_parte(0); com 'max_bytes', o resto segue em nome_parte(1), (2)...
+    Retorna (arquivos_gerados, tempo_de_cada_pagina, tempo_de_gravacao).
+    """
+    arquivos = [nome_parte(0)]
+    c = canvas.Canvas(arquivos[0], pagesize=A4, invariant=invariant)
+    bytes_parte = 0
+    tempos_paginas = []
+    tempo_gravacao = 0.0
+    for peca, nome_geometria in zip(pecas, nomes_geometria or [None] * len(pecas)):
+        if max_bytes and bytes_parte >= max_bytes:
+            inicio = time.perf_counter()
+            c.save()
+            tempo_gravacao += time.perf_counter() - inicio
+            arquivos.append(nome_parte(len(arquivos)))
+            c = canvas.Canvas(arquivos[-1], pagesize=A4, invariant=invariant)
+            bytes_parte = 0
+        inicio = time.perf_counter()
+        desenhar_forma(c, peca, nome_geometria)
+        if max_bytes:
+            bytes_parte += _tamanho_pagina_estimado(c)
+        c.showPage()
+        tempos_paginas.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    c.save()
+    tempo_gravacao += time.perf_counter() - inicio
+    return arquivos, tempos_paginas, tempo_gravacao
@@ -0,0 +1,169 @@
+# pieces.py
+
+import math
+import pandas as pd
+
+# Campos numéricos de uma peça, na mesma nomenclatura das colunas da lista de peças
+CAMPOS_NUMERICOS = ('qtd', 'largura', 'altura', 'diametro', 'rt_base', 'rt_height',
+                    'trapezoid_large_base', 'trapezoid_small_base', 'trapezoid_height')
+
+def to_float(value, default=0.0):
+    """Converte valores da planilha/interface (inclusive '12,5', NaN e None) para float."""
+    if value is None: return default
+    try:
+        value = float(value.replace(',', '.')) if isinstance(value, str) else float(value)
+    except (ValueError, TypeError):
+        return default
+    return default if math.isnan(value) else value
+
+def _to_text(value):
+    if value is None or pd.isna(value):
+        return None
+    text = str(value).strip()
+    return text or None
+
+# Campos que definem o contorno de cada forma
+DIMENSOES_POR_FORMA = {
+    'rectangle': ('largura', 'altura'),
+    'circle': ('diametro',),
+    'right_triangle': ('rt_base', 'rt_height'),
+    'trapezoid': ('trapezoid_large_base', 'trapezoid_small_base', 'trapezoid_height'),
+}
+
+def contorno_forma(forma, medidas):
+    """
+    Contorno de uma forma com a origem no canto inferior esquerdo, a partir das medidas
+    com os nomes das colunas (largura, altura, diametro...): ('polyline', [(x, y), ...]) para
+    polígonos (vértices em sentido anti-horário) ou ('circle', (cx, cy), raio).
+    None se a forma for desconhecida. Única definição da geometria das peças, usada tanto
+    na validação dos furos (Piece.contorno) quanto no DXF (dxf_engine.contorno_da_forma).
+    """
+    medida = lambda campo: medidas.get(campo, 0)
+    if forma == 'rectangle':
+        largura, altura = medida('largura'), medida('altura')
+        return 'polyline', [(0, 0), (largura, 0), (largura, altura), (0, altura)]
+    if forma == 'circle':
+        raio = medida('diametro') / 2
+        return 'circle', (raio, raio), raio
+    if forma == 'right_triangle':
+        return 'polyline', [(0, 0), (medida('rt_base'), 0), (0, medida('rt_height'))]
+    if forma == 'trapezoid':
+        base, topo, altura = medida('trapezoid_large_base'), medida('trapezoid_small_base'), medida('trapezoid_height')
+        recuo = (base - topo) / 2
+        return 'polyline', [(0, 0), (base, 0), (base - recuo, altura), (recuo, altura)]
+    return None
+
+class Hole:
+    """Furo de uma peça: diâmetro e posição do centro em relação à origem da peça."""
+    __slots__ = ('diam', 'x', 'y')
+
+    def __init__(self, diam, x, y):
+        self.diam = diam
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def from_mapping(cls, furo):
+        return cls(to_float(furo.get('diam')), to_float(furo.get('x')), to_float(furo.get('y')))
+
+    def to_dict(self):
+        return {'diam': self.diam, 'x': self.x, 'y': self.y}
+
+    def __repr__(self):
+        return f"Hole(diam={self.diam}, x={self.x}, y={self.y})"
+
+class Piece:
+    """
+    Representação compacta de uma linha da lista de peças, usada por pdf_generator,
+    dxf_engine e generation. É construída uma única vez a partir do DataFrame validado,
+    e os valores já chegam convertidos (números como float, forma em minúsculas).
+    """
+    __slots__ = ('nome_arquivo', 'forma', 'espessura') + CAMPOS_NUMERICOS + ('furos', 'erro')
+
+    def __init__(self, nome_arquivo=None, forma='', espessura=None, qtd=0.0, largura=0.0, altura=0.0,
+                 diametro=0.0, rt_base=0.0, rt_height=0.0, trapezoid_large_base=0.0,
+                 trapezoid_small_base=0.0, trapezoid_height=0.0, furos=()):
+        self.nome_arquivo = nome_arquivo
+        self.forma = forma
+        # Espessura ausente fica como None (agrupada como 'Sem_Espessura')
+        self.espessura = espessura
+        self.qtd = qtd
+        self.largura = largura
+        self.altura = altura
+        self.diametro = diametro
+        self.rt_base = rt_base
+        self.rt_height = rt_height
+        self.trapezoid_large_base = trapezoid_large_base
+        self.trapezoid_small_base = trapezoid_small_base
+        self.trapezoid_height = trapezoid_height
+        self.furos = tuple(furos)
+        # Mensagem de erro da validação (validacao.validar_dataframe); None se a peça é válida
+        self.erro = None
+
+    @classmethod
+    def from_mapping(cls, registro):
+        """
+        Cria uma peça a partir de um dicionário (ou Series) com as colunas da lista de peças.
+        Apenas converte os valores; para obter a peça já validada, use validacao.peca_validada.
+        """
+        furos = registro.get('furos')
+        espessura = to_float(registro.get('espessura'), default=None)
+        return cls(
+            nome_arquivo=_to_text(registro.get('nome_arquivo')),
+            forma=(_to_text(registro.get('forma')) or '').lower(),
+            espessura=espessura,
+            furos=[Hole.from_mapping(f) for f in furos] if isinstance(furos, list) else (),
+            **{campo: to_float(registro.get(campo)) for campo in CAMPOS_NUMERICOS}
+        )
+
+    def chave_geometria(self):
+        """
+        Chave da geometria normalizada: forma, dimensões usadas por ela, furos (na ordem)
+        e erro de validação. Peças com a mesma chave têm o mesmo desenho.
+        """
+        dimensoes = tuple(round(getattr(self, campo), 6) for campo in DIMENSOES_POR_FORMA.get(self.forma, ()))
+        furos = tuple((round(f.diam, 6), round(f.x, 6), round(f.y, 6)) for f in self.furos)
+        return self.forma, dimensoes, furos, self.erro
+
+    def contorno(self):
+        """Contorno da peça (veja contorno_forma); None se a forma for desconhecida."""
+        return contorno_forma(self.forma, {campo: getattr(self, campo) for campo in DIMENSOES_POR_FORMA.get(self.forma, ())})
+
+    def com_furos(self, furos):
+        """Cópia da peça com outra sequência de furos (por exemplo, reordenados para a furação)."""
+        copia = Piece.__new__(Piece)
+        for campo in Piece.__slots__:
+            setattr(copia, campo, getattr(self, campo))
+        copia.furos = tuple(furos)
+        return copia
+
+    def get(self, key, default=None):
+        """Acesso no estilo dicionário, para código que ainda trata a peça como uma linha."""
+        if key == 'furos':
+            return [furo.to_dict() for furo in self.furos]
+        value = getattr(self, key, None) if key in Piece.__slots__ else None
+        return default if value is None else value
+
+    def to_dict(self):
+        """Converte de volta para o formato de linha usado pelos DataFrames de main.py."""
+        registro = {campo: getattr(self, campo) for campo in Piece.__slots__ if campo != 'erro'}
+        registro['furos'] = [furo.to_dict() for furo in self.furos]
+        return registro
+
+    def __repr__(self):
+        return f"Piece({self.nome_arquivo!r}, {self.forma!r}, espessura={self.espessura})"
+
+def pieces_from_dataframe(df):
+    """
+    Converte um DataFrame já validado por validacao.validar_dataframe em uma lista de
+    Piece. Os valores das colunas são usados como estão, sem conversão por célula.
+    """
+    espessuras = [None if math.isnan(e) else e for e in df['espessura'].tolist()]
+    numeros = [df[campo].tolist() for campo in CAMPOS_NUMERICOS]
+    pecas = []
+    for nome, forma, espessura, furos, erro, *valores in zip(df['nome_arquivo'].tolist(), df['forma'].tolist(), espessuras,
+                                                              df['furos'].tolist(), df['erro'].tolist(), *numeros):
+        peca = Piece(nome, forma, espessura, *valores, furos=[Hole.from_mapping(f) for f in furos])
+        peca.erro = erro
+        pecas.append(peca)
+    return pecas
\ No newline at end of file
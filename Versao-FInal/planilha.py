@@ -0,0 +1,26 @@
+# planilha.py
+
+import json
+import pandas as pd
+
+from validacao import normalizar_colunas
+
+# Colunas esperadas na lista de peças (mesma ordem exibida na interface)
+COLUNAS_DF = ['nome_arquivo', 'forma', 'espessura', 'qtd', 'largura', 'altura', 'diametro', 'rt_base', 'rt_height', 'trapezoid_large_base', 'trapezoid_small_base', 'trapezoid_height', 'furos']
+
+def parse_furos(x):
+    """Converte a coluna 'furos' da planilha (texto em formato de lista) em lista de dicionários."""
+    if isinstance(x, list): return x
+    if isinstance(x, str) and x.startswith('['):
+        try: return json.loads(x.replace("'", "\""))
+        except json.JSONDecodeError: return []
+    return []
+
+def carregar_planilha(file_path):
+    """
+    Lê uma planilha de peças e devolve um DataFrame com exatamente as colunas de COLUNAS_DF.
+    Nomes alternativos de coluna (ex.: 'quantidade', 'width') são traduzidos em validacao.
+    """
+    df = normalizar_colunas(pd.read_excel(file_path, header=0, decimal=','))
+    df['furos'] = df['furos'].apply(parse_furos)
+    return df[COLUNAS_DF]
@@ -0,0 +1,78 @@
+# profiling.py
+
+import os
+import io
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Variáveis de ambiente que ligam a captura sem alterar a interface
+ENV_PROFILE = "GERADOR_PROFILE"
+ENV_TRACEMALLOC = "GERADOR_TRACEMALLOC"
+
+TOP_FUNCOES = 40
+TOP_ALOCACOES = 25
+
+def _env_ligado(nome):
+    return os.environ.get(nome, "").strip().lower() in ("1", "true", "sim", "yes", "on")
+
+def perfil_ativo():
+    return _env_ligado(ENV_PROFILE)
+
+def memoria_ativa():
+    return _env_ligado(ENV_TRACEMALLOC)
+
+@contextmanager
+def capturar_perfil(diretorio_saida, cprofile=True, memoria=False, log=print):
+    """
+    Executa o bloco sob cProfile e/ou tracemalloc e grava os relatórios em
+    '<diretorio_saida>/perfil': o .pstats (para snakeviz, pstats etc.), um resumo
+    em texto das funções mais caras e as maiores alocações de memória.
+    Só o thread/processo atual é medido; os workers paralelos ficam de fora.
+    """
+    if not cprofile and not memoria:
+        yield
+        return
+
+    pasta = os.path.join(diretorio_saida, "perfil")
+    prefixo = os.path.join(pasta, f"perfil_{datetime.now():%Y%m%d_%H%M%S}")
+    profiler = cProfile.Profile() if cprofile else None
+    iniciou_tracemalloc = memoria and not tracemalloc.is_tracing()
+    if iniciou_tracemalloc:
+        tracemalloc.start()
+    snapshot_inicial = tracemalloc.take_snapshot() if memoria else None
+
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        snapshot_final = tracemalloc.take_snapshot() if memoria else None
+        pico = tracemalloc.get_traced_memory()[1] if memoria else 0
+        if iniciou_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(pasta, exist_ok=True)
+        if profiler:
+            profiler.dump_stats(prefixo + ".pstats")
+            texto = io.StringIO()
+            stats = pstats.Stats(profiler, stream=texto)
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCOES)
+            stats.sort_stats("tottime").print_stats(TOP_FUNCOES)
+            with open(prefixo + "_funcoes.txt", 'w', encoding='utf-8') as f:
+                f.write(texto.getvalue())
+            log(f"Perfil de CPU salvo em: {prefixo}.pstats")
+        if memoria:
+            with open(prefixo + "_memoria.txt", 'w', encoding='utf-8') as f:
+                f.write(f"Pico de memória rastreada: {pico / (1024 * 1024):.1f} MB\n\n")
+                f.write(f"Maiores alocações ainda vivas ao final ({TOP_ALOCACOES}):\n")
+                for stat in snapshot_final.statistics("lineno")[:TOP_ALOCACOES]:
+                    f.write(f"{stat}\n")
+                f.write(f"\nMaiores crescimentos durante a execução ({TOP_ALOCACOES}):\n")
+                for stat in snapshot_final.compare_to(snapshot_inicial, "lineno")[:TOP_ALOCACOES]:
+                    f.write(f"{stat}\n")
+            log(f"Relatório de memória salvo em: {prefixo}_memoria.txt")
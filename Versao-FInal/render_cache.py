@@ -0,0 +1,131 @@
+# render_cache.py
+
+import os
+import json
+import hashlib
+
+from pieces import CAMPOS_NUMERICOS
+
+# Versão do formato do manifesto; ao mudar, o cache antigo é descartado
+VERSAO_MANIFESTO = 2
+
+def _arredondar(valor):
+    return None if valor is None else round(valor, 6)
+
+def chave_peca(peca, versao_gerador, ordem_furos=None):
+    """
+    Gera um hash estável da peça: forma, dimensões, furos, campos do carimbo
+    e versão do gerador. Qualquer mudança em um deles invalida a entrada no cache.
+    'ordem_furos' é a versão da reordenação de furos quando ela está ligada: a chave
+    continua calculada com os furos na ordem da planilha, mais essa marca.
+    """
+    dados = {
+        'versao': versao_gerador,
+        'nome_arquivo': str(peca.nome_arquivo),
+        'forma': peca.forma,
+        'espessura': _arredondar(peca.espessura),
+        'furos': [[_arredondar(f.diam), _arredondar(f.x), _arredondar(f.y)] for f in peca.furos],
+    }
+    for campo in CAMPOS_NUMERICOS:
+        dados[campo] = _arredondar(getattr(peca, campo))
+    if ordem_furos:
+        dados['ordem_furos'] = ordem_furos
+    return _hash(dados)
+
+def chave_arquivo(chaves_pecas, *extras):
+    """Hash de um arquivo de saída composto por várias peças, na ordem em que aparecem."""
+    return _hash([list(chaves_pecas), [str(e) for e in extras]])
+
+def _hash(dados):
+    texto = json.dumps(dados, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    """
+    Cache incremental de geração por projeto, salvo em '.cache_geracao' dentro
+    do diretório do projeto. Guarda os DXFs de cada peça e o hash de cada PDF gerado,
+    para que uma nova execução refaça apenas o que mudou.
+    """
+    def __init__(self, project_directory):
+        self.cache_dir = os.path.join(project_directory, ".cache_geracao")
+        self.dxf_dir = os.path.join(self.cache_dir, "dxf")
+        self.manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self.manifest = self._load_manifest()
+        self.dxf_usados = set()
+        self.dxf_reaproveitados = 0
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('versao') == VERSAO_MANIFESTO:
+                return manifest
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {'versao': VERSAO_MANIFESTO, 'dxf': {}, 'pdf': {}}
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    # --- DXF por peça ---
+
+    def buscar_dxf(self, chave):
+        """Retorna (nome_do_arquivo, conteudo_dxf) se a peça já estiver no cache, ou None."""
+        filename = self.manifest['dxf'].get(chave)
+        if filename is not None:
+            try:
+                with open(os.path.join(self.dxf_dir, f"{chave}.dxf"), 'r', encoding='utf-8', newline='') as f:
+                    conteudo = f.read()
+                self.dxf_usados.add(chave)
+                self.dxf_reaproveitados += 1
+                return filename, conteudo
+            except OSError:
+                del self.manifest['dxf'][chave]
+        return None
+
+    def registrar_dxf(self, chave, filename, conteudo):
+        self.dxf_usados.add(chave)
+        if chave in self.manifest['dxf']:
+            return
+        os.makedirs(self.dxf_dir, exist_ok=True)
+        with open(os.path.join(self.dxf_dir, f"{chave}.dxf"), 'w', encoding='utf-8', newline='') as f:
+            f.write(conteudo)
+        self.manifest['dxf'][chave] = filename
+
+    def limpar_dxf_nao_usados(self):
+        """Remove do cache as peças que não fizeram parte da última geração de DXFs."""
+        for chave in list(self.manifest['dxf']):
+            if chave not in self.dxf_usados:
+                del self.manifest['dxf'][chave]
+                try:
+                    os.remove(os.path.join(self.dxf_dir, f"{chave}.dxf"))
+                except OSError:
+                    pass
+
+    # --- PDF por arquivo ---
+
+    def pdf_atualizado(self, pdf_filename, chave):
+        """
+        Verifica se o PDF (ou todas as suas partes) em disco foi gerado a partir
+        exatamente das mesmas peças e com as mesmas opções.
+        """
+        entrada = self.manifest['pdf'].get(os.path.basename(pdf_filename))
+        if not entrada or entrada.get('chave') != chave:
+            return False
+        pasta = os.path.dirname(pdf_filename)
+        try:
+            return all(os.path.getsize(os.path.join(pasta, nome)) == tamanho
+                       for nome, tamanho in entrada.get('arquivos', {}).items())
+        except OSError:
+            return False
+
+    def registrar_pdf(self, pdf_filename, chave, arquivos):
+        """Registra o PDF de uma espessura e os arquivos (partes) em que ele foi gravado."""
+        self.manifest['pdf'][os.path.basename(pdf_filename)] = {
+            'chave': chave,
+            'arquivos': {os.path.basename(nome): os.path.getsize(nome) for nome in arquivos},
+        }
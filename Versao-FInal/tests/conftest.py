@@ -0,0 +1,8 @@
+# conftest.py
+
+import os
+import sys
+
+# Os módulos do programa se importam pelo nome (rodam a partir de Versao-FInal)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
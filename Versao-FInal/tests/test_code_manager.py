@@ -0,0 +1,109 @@
+# test_code_manager.py
+
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import code_manager
+from code_manager import CodeGenerator, CodePrefetcher, ENV_LOTE_CODIGOS
+
+@pytest.fixture(autouse=True)
+def sem_mensagens(monkeypatch):
+    avisos = []
+    monkeypatch.setattr(code_manager.QMessageBox, "warning", lambda *args: avisos.append(args[2]))
+    monkeypatch.setattr(code_manager.QMessageBox, "critical", lambda *args: avisos.append(args[2]))
+    return avisos
+
+def _gerador(pasta, **opcoes):
+    return CodeGenerator(db_path=str(pasta / "codigos.db"), legacy_xlsx_path=str(pasta / "nao_existe.xlsx"),
+                         lease_dir=str(pasta), **opcoes)
+
+def test_lote_invalido_na_variavel_de_ambiente(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv(ENV_LOTE_CODIGOS, "cinquenta")
+    gerador = _gerador(tmp_path)
+    assert gerador.lease_size == 0
+    assert ENV_LOTE_CODIGOS in capsys.readouterr().out
+    assert gerador.reserve_codes("P1", 2) == ["DES1", "DES2"]
+    gerador.close()
+
+def test_banco_aberto_pela_metade_fica_indisponivel(tmp_path, monkeypatch, sem_mensagens):
+    def falha(self):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(CodeGenerator, "_prepare_database", falha)
+    gerador = _gerador(tmp_path)
+    assert gerador.conn is None
+    assert "database is locked" in sem_mensagens[0]
+    assert gerador.reserve_codes("P1", 1) is None
+    with pytest.raises(sqlite3.OperationalError):
+        gerador.allocate_codes("P1", 1)
+    gerador.close()
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.01)
+
+def test_pre_reserva_libera_sobras_sem_bloquear(tmp_path):
+    gerador = _gerador(tmp_path)
+    prefetcher = CodePrefetcher(gerador, pool_size=3)
+    prefetcher.set_project("P1")
+    _esperar(lambda: len(prefetcher.pool) == 3)
+    usado = prefetcher.take("P1")
+    # Com o banco ocupado, a troca de projeto não espera pela trava
+    with gerador._db_lock:
+        inicio = time.perf_counter()
+        prefetcher.set_project("P2")
+        assert time.perf_counter() - inicio < 0.1
+    _esperar(lambda: len(prefetcher.pool) == 3)
+    prefetcher.stop()
+    gerador.close()
+
+    conn = sqlite3.connect(str(tmp_path / "codigos.db"))
+    liberados = {codigo for (codigo,) in conn.execute("SELECT codigo FROM codigos WHERE liberado_em IS NOT NULL")}
+    conn.close()
+    assert usado == "DES1"
+    assert liberados == {"DES2", "DES3", "DES4", "DES5", "DES6"}
+    # Números liberados não são emitidos de novo
+    gerador = _gerador(tmp_path)
+    assert gerador.reserve_codes("P3", 1) == ["DES7"]
+    gerador.close()
+
+# ======================================================================
+# Vários processos reservando códigos no mesmo banco
+# ======================================================================
+
+def _reservar_em_processo(db_path, estacao, lease_dir, lease_size, rodadas, compartilhado):
+    gerador = CodeGenerator(db_path, legacy_xlsx_path='', lease_size=lease_size, station=estacao, lease_dir=lease_dir,
+                            shared=compartilhado)
+    codigos = []
+    for rodada in range(rodadas):
+        # Mistura reservas unitárias (botão "Gerar Código") e em bloco
+        codigos += gerador.allocate_codes(f"carga-{estacao}", 1 + rodada % 3)
+    gerador.close()
+    return codigos
+
+@pytest.mark.parametrize("compartilhado", [False, True], ids=["wal", "pasta_de_rede"])
+def test_varios_processos_sem_codigo_repetido(tmp_path, compartilhado):
+    processos, rodadas, lote = 4, 40, 5
+    db_path = str(tmp_path / "codigo_database.db")
+    CodeGenerator(db_path, legacy_xlsx_path='', shared=compartilhado).close()
+    # Processos pares reservam direto no banco; ímpares usam concessões, dois a dois na mesma estação
+    tarefas = [(db_path, "estacao" if i % 2 else f"direto{i}", str(tmp_path / "local"),
+                lote if i % 2 else 0, rodadas, compartilhado) for i in range(processos)]
+    with ProcessPoolExecutor(processos) as executor:
+        resultados = list(executor.map(_reservar_em_processo, *zip(*tarefas)))
+
+    emitidos = [codigo for codigos in resultados for codigo in codigos]
+    repetidos = [codigo for codigo, vezes in Counter(emitidos).items() if vezes > 1]
+    assert not repetidos
+    conn = sqlite3.connect(db_path)
+    gravados = {codigo for (codigo,) in conn.execute("SELECT codigo FROM codigos")}
+    ultimo = conn.execute("SELECT ultimo FROM sequencias WHERE prefixo = 'DES'").fetchone()[0]
+    conn.close()
+    # Todos os emitidos chegaram ao banco, e a sequência nunca fica atrás do maior número emitido
+    assert gravados == set(emitidos)
+    assert ultimo >= max(int(codigo[3:]) for codigo in emitidos)
@@ -0,0 +1,25 @@
+# test_dxf_engine.py
+
+import io
+
+import ezdxf
+
+from dxf_engine import build_sheet_dxf
+from pieces import Piece
+
+def _retangulo(nome, qtd, largura=100.0):
+    return Piece(nome_arquivo=nome, forma='rectangle', espessura=2.0, qtd=qtd, largura=largura, altura=50.0)
+
+def _inserts(conteudo):
+    return [e.dxf.name for e in ezdxf.read(io.StringIO(conteudo)).modelspace() if e.dxftype() == 'INSERT']
+
+def test_chapa_um_insert_por_unidade():
+    conteudo, avisos, _ = build_sheet_dxf([_retangulo("A", 3.0), _retangulo("B", 2.0, largura=80.0)])
+    assert avisos == []
+    assert sorted(_inserts(conteudo)) == ["A"] * 3 + ["B"] * 2
+
+def test_chapa_sem_copia_para_quantidade_zero():
+    conteudo, avisos, _ = build_sheet_dxf([_retangulo("A", 2.0), _retangulo("B", 0.0, largura=80.0)])
+    assert _inserts(conteudo) == ["A", "A"]
+    assert [nome for nome, _ in avisos] == ["B"]
+    assert build_sheet_dxf([_retangulo("C", 0.0)])[0] is None
@@ -0,0 +1,39 @@
+# test_generation.py
+
+import os
+
+import pandas as pd
+
+from generation import GenerationJob, lotes_com_cache, desfazer_lotes
+
+def test_lotes_mantem_ordem_com_itens_em_cache():
+    itens = [(chave, chave * 10) for chave in range(10)]
+    # Chaves pares já estão "em cache"
+    pronto = lambda chave: f"cache{chave}" if chave % 2 == 0 else None
+    lotes = list(lotes_com_cache(itens, pronto, 2))
+    assert all(len(argumentos) <= 2 for _, argumentos in lotes)
+    processados = [(chaves, [f"novo{argumento}" for argumento in argumentos]) for chaves, argumentos in lotes]
+    assert list(desfazer_lotes(processados)) == [(chave, f"cache{chave}" if chave % 2 == 0 else f"novo{chave * 10}")
+                                                 for chave in range(10)]
+
+def test_lotes_sem_cache():
+    lotes = list(lotes_com_cache([(i, i) for i in range(5)], None, 3))
+    assert [argumentos for _, argumentos in lotes] == [[0, 1, 2], [3, 4]]
+
+def _pecas(quantidade):
+    return pd.DataFrame([dict(nome_arquivo=f"DES{i}", forma='rectangle', espessura=2.0, qtd=1.0, largura=100.0, altura=50.0,
+                              diametro=0.0, rt_base=0.0, rt_height=0.0, trapezoid_large_base=0.0, trapezoid_small_base=0.0,
+                              trapezoid_height=0.0, furos=[]) for i in range(quantidade)])
+
+def _gerar_pdfs(pasta, quantidade, **opcoes):
+    GenerationJob(_pecas(quantidade), generate_pdf=True, generate_dxf=False, project_directory=str(pasta),
+                  use_cache=False, log=lambda mensagem: None, **opcoes).run()
+    return sorted(os.listdir(os.path.join(pasta, "PDFs")))
+
+def test_pdf_sem_limite_tem_nome_final(tmp_path):
+    assert _gerar_pdfs(tmp_path, 3) == ["Desenhos_PDF_Espessura_2mm.pdf"]
+
+def test_pdf_dividido_por_paginas_e_bytes(tmp_path):
+    assert _gerar_pdfs(tmp_path, 5, max_paginas_pdf=2) == [f"Desenhos_PDF_Espessura_2mm_parte0{n}.pdf" for n in (1, 2, 3)]
+    # Limite de bytes menor que uma página: uma parte por peça, e as partes antigas são substituídas
+    assert _gerar_pdfs(tmp_path, 4, max_paginas_pdf=3, max_bytes_pdf=1) == [f"Desenhos_PDF_Espessura_2mm_parte0{n}.pdf" for n in (1, 2, 3, 4)]
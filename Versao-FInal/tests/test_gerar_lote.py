@@ -0,0 +1,27 @@
+# test_gerar_lote.py
+
+import pandas as pd
+
+import gerar_lote
+from planilha import COLUNAS_DF
+
+def _planilha(caminho, formas):
+    linhas = [dict(nome_arquivo=f"DES{i}", forma=forma, espessura=2.0, qtd=1.0, largura=100.0, altura=50.0,
+                   diametro=0.0, rt_base=0.0, rt_height=0.0, trapezoid_large_base=0.0, trapezoid_small_base=0.0,
+                   trapezoid_height=0.0, furos="[]") for i, forma in enumerate(formas)]
+    pd.DataFrame(linhas, columns=COLUNAS_DF).to_excel(caminho, index=False)
+    return str(caminho)
+
+def test_planilha_valida_termina_com_zero(tmp_path):
+    planilha = _planilha(tmp_path / "lote.xlsx", ['rectangle', 'rectangle'])
+    assert gerar_lote.main([planilha, str(tmp_path / "saida"), "--pdf", "-q"]) == 0
+
+def test_linha_recusada_na_validacao_termina_com_erro(tmp_path, capsys):
+    planilha = _planilha(tmp_path / "lote.xlsx", ['rectangle', 'hexagon'])
+    assert gerar_lote.main([planilha, str(tmp_path / "saida"), "--pdf", "-q"]) == 1
+    assert "1 peça(s) com falha." in capsys.readouterr().err
+
+def test_linha_recusada_conta_uma_vez_com_pdf_e_dxf(tmp_path, capsys):
+    planilha = _planilha(tmp_path / "lote.xlsx", ['rectangle', 'hexagon'])
+    assert gerar_lote.main([planilha, str(tmp_path / "saida"), "--pdf", "--dxf", "-q"]) == 1
+    assert "1 peça(s) com falha." in capsys.readouterr().err
@@ -0,0 +1,44 @@
+# test_ordem_furos.py
+
+import pandas as pd
+
+from ordem_furos import otimizar_ordem, _listas_vizinhos
+from generation import GenerationJob
+
+def test_fila_horizontal():
+    ordem, antes, depois = otimizar_ordem([(30, 50), (50, 50), (70, 50)])
+    assert sorted(ordem) == [0, 1, 2]
+    assert depois <= antes
+
+def test_coluna_vertical():
+    pontos = [(50, 70), (50, 10), (50, 40), (50, 100)]
+    ordem, antes, depois = otimizar_ordem(pontos)
+    assert ordem == [1, 2, 0, 3]
+    assert depois < antes
+
+def test_fila_longa_embaralhada():
+    pontos = [(float((i * 37) % 500) * 10, 20.0) for i in range(500)]
+    ordem, _, depois = otimizar_ordem(pontos)
+    assert sorted(ordem) == list(range(500))
+    # Da origem até (0, 20) e depois a fila inteira, sem voltar
+    assert depois == 20 + max(x for x, _ in pontos)
+
+def test_pontos_repetidos():
+    ordem, antes, depois = otimizar_ordem([(5, 5)] * 4)
+    assert sorted(ordem) == [0, 1, 2, 3]
+    assert depois == antes
+    assert _listas_vizinhos([(5, 5)] * 3, 8) == [[1, 2], [0, 2], [0, 1]]
+
+def test_furo_unico():
+    assert otimizar_ordem([(30, 50)])[0] == [0]
+    assert _listas_vizinhos([(30, 50)], 8) == [[]]
+
+def test_geracao_com_furos_alinhados(tmp_path):
+    df = pd.DataFrame([dict(nome_arquivo="DES1", forma='rectangle', espessura=2.0, qtd=1.0,
+                            largura=100.0, altura=100.0, diametro=0.0, rt_base=0.0, rt_height=0.0,
+                            trapezoid_large_base=0.0, trapezoid_small_base=0.0, trapezoid_height=0.0,
+                            furos=[{'diam': 5.0, 'x': x, 'y': 50.0} for x in (70.0, 30.0, 50.0)])])
+    job = GenerationJob(df, generate_pdf=False, generate_dxf=True, project_directory=str(tmp_path),
+                        ordenar_furos=True, use_cache=False, log=lambda mensagem: None)
+    job.run()
+    assert not job.falhas
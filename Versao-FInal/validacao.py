@@ -0,0 +1,229 @@
+# validacao.py
+
+import os
+import json
+import math
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from pieces import CAMPOS_NUMERICOS, DIMENSOES_POR_FORMA, pieces_from_dataframe
+
+# Colunas de uma peça, na ordem da interface
+COLUNAS_PECA = ['nome_arquivo', 'forma', 'espessura', *CAMPOS_NUMERICOS, 'furos']
+
+# Nomes alternativos aceitos nas planilhas -> nome interno da coluna
+ALIASES_COLUNAS = {
+    'nome': 'nome_arquivo', 'nome arquivo': 'nome_arquivo', 'arquivo': 'nome_arquivo', 'part_name': 'nome_arquivo',
+    'shape': 'forma', 'tipo': 'forma',
+    'esp': 'espessura', 'thickness': 'espessura',
+    'quantidade': 'qtd', 'qtde': 'qtd', 'quantity': 'qtd',
+    'width': 'largura', 'height': 'altura', 'diameter': 'diametro', 'diâmetro': 'diametro',
+    'holes': 'furos',
+}
+
+# Nomes de forma aceitos (em português, com ou sem acento) -> forma interna
+ALIASES_FORMAS = {
+    'retangulo': 'rectangle', 'retângulo': 'rectangle',
+    'circulo': 'circle', 'círculo': 'circle',
+    'triangulo_retangulo': 'right_triangle', 'triângulo_retângulo': 'right_triangle',
+    'triangulo retangulo': 'right_triangle', 'triângulo retângulo': 'right_triangle',
+    'trapezio': 'trapezoid', 'trapézio': 'trapezoid',
+}
+
+# Nome de cada forma nas mensagens de erro
+NOMES_FORMAS = {'rectangle': 'Retângulo', 'circle': 'Círculo', 'right_triangle': 'Triângulo Retângulo', 'trapezoid': 'Trapézio'}
+
+ERRO_DADOS_INSUFICIENTES = "Dados insuficientes: 'part_name' ou 'shape' ausentes."
+
+def normalizar_colunas(df):
+    """
+    Padroniza os nomes das colunas (minúsculas, sem espaços nas pontas, aliases
+    traduzidos), descarta duplicadas e cria as colunas ausentes com valores vazios.
+    """
+    df = df.copy()
+    nomes = df.columns.astype(str).str.strip().str.lower()
+    df.columns = [ALIASES_COLUNAS.get(nome, nome) for nome in nomes]
+    df = df.loc[:, ~df.columns.duplicated()]
+    for col in COLUNAS_PECA:
+        if col not in df.columns: df[col] = pd.NA
+    return df
+
+def _coluna_numerica(serie):
+    """Converte a coluna inteira para float ('12,5' -> 12.5); valores inválidos viram NaN."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype('float64')
+    texto = serie.astype('string').str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto, errors='coerce').astype('float64')
+
+def _coluna_texto(serie):
+    texto = serie.astype('string').str.strip()
+    return texto.mask(texto == '')
+
+def validar_dataframe(df):
+    """
+    Valida e normaliza a lista de peças inteira com operações por coluna.
+    Retorna (df_limpo, relatorio):
+      - df_limpo: colunas de COLUNAS_PECA já tipadas (números em float, forma em
+        minúsculas e traduzida, furos sempre em lista) mais a coluna 'erro', com a
+        mensagem de erro da linha ou None;
+      - relatorio: DataFrame com 'linha' (1 = primeira peça), 'nome_arquivo' e 'erro'
+        apenas das linhas inválidas.
+    """
+    df = normalizar_colunas(df).reset_index(drop=True)
+    limpo = pd.DataFrame(index=df.index)
+
+    nomes = _coluna_texto(df['nome_arquivo'])
+    formas = _coluna_texto(df['forma']).str.lower()
+    formas = formas.replace(ALIASES_FORMAS)
+    limpo['nome_arquivo'] = nomes.astype(object).where(nomes.notna(), None)
+    limpo['forma'] = formas.fillna('').astype(object)
+    # Espessura ausente continua NaN (vira None na Piece e é agrupada como 'Sem_Espessura')
+    limpo['espessura'] = _coluna_numerica(df['espessura'])
+    for campo in CAMPOS_NUMERICOS:
+        limpo[campo] = _coluna_numerica(df[campo]).fillna(0.0)
+    limpo['furos'] = df['furos'].map(lambda furos: furos if isinstance(furos, list) else [])
+
+    # Regras em ordem de prioridade: vale a primeira que falhar em cada linha
+    sem_dados = nomes.isna().to_numpy() | formas.isna().to_numpy()
+    condicoes = [sem_dados, ~limpo['forma'].isin(list(DIMENSOES_POR_FORMA)).to_numpy()]
+    mensagens = [ERRO_DADOS_INSUFICIENTES, ("Forma '" + limpo['forma'] + "' desconhecida.").to_numpy()]
+    for forma, campos in DIMENSOES_POR_FORMA.items():
+        nao_positivos = (limpo[list(campos)].to_numpy() <= 0).any(axis=1)
+        condicoes.append((limpo['forma'] == forma).to_numpy() & nao_positivos)
+        mensagens.append(f"Dimensões inválidas para {NOMES_FORMAS[forma]}: {', '.join(campos)} devem ser maiores que zero.")
+    erros = np.select(condicoes, mensagens, default=None)
+    limpo['erro'] = pd.Series(erros, index=limpo.index, dtype=object)
+
+    invalidas = limpo['erro'].notna()
+    relatorio = pd.DataFrame({
+        'linha': limpo.index[invalidas] + 1,
+        'nome_arquivo': limpo.loc[invalidas, 'nome_arquivo'],
+        'erro': limpo.loc[invalidas, 'erro'],
+    }).reset_index(drop=True)
+    return limpo, relatorio
+
+def peca_validada(registro):
+    """Cria uma Piece validada a partir de uma única linha (dict/Series) da lista de peças."""
+    if isinstance(registro, pd.Series):
+        registro = registro.to_dict()
+    limpo, _ = validar_dataframe(pd.DataFrame([registro]))
+    return pieces_from_dataframe(limpo)[0]
+
+# ======================================================================
+# Validação dos furos: dentro do contorno e sem sobreposição
+# ======================================================================
+
+# Folga numérica (mm): furos tangentes à borda ou entre si são aceitos
+TOLERANCIA_FURO = 1e-6
+# Quantos problemas de uma mesma peça entram na mensagem de erro
+MAX_PROBLEMAS_POR_PECA = 3
+
+def _semiplanos_internos(pontos):
+    """
+    Para um polígono convexo em sentido anti-horário, devolve (nx, ny, c) de cada aresta,
+    com a normal unitária apontando para dentro: nx*x + ny*y + c é a distância até a aresta.
+    """
+    semiplanos = []
+    for (x1, y1), (x2, y2) in zip(pontos, pontos[1:] + pontos[:1]):
+        comprimento = math.hypot(x2 - x1, y2 - y1)
+        if comprimento > 0:
+            nx, ny = -(y2 - y1) / comprimento, (x2 - x1) / comprimento
+            semiplanos.append((nx, ny, -(nx * x1 + ny * y1)))
+    return semiplanos
+
+def _furo_dentro(contorno, semiplanos, furo):
+    raio = furo.diam / 2
+    if contorno[0] == 'circle':
+        (cx, cy), raio_peca = contorno[1], contorno[2]
+        return math.hypot(furo.x - cx, furo.y - cy) + raio <= raio_peca + TOLERANCIA_FURO
+    return all(nx * furo.x + ny * furo.y + c >= raio - TOLERANCIA_FURO for nx, ny, c in semiplanos)
+
+def _furos_sobrepostos(furos):
+    """
+    Pares (i, j), com i < j, de furos que se sobrepõem. Usa uma grade uniforme com células
+    do tamanho do diâmetro mediano. Cada par é testado a partir do maior dos dois furos,
+    que procura nas células até a distância do próprio diâmetro: um furo grande entre
+    muitos pequenos só alarga a busca dele, e o custo continua quase linear mesmo em
+    peças com milhares de furos.
+    """
+    diametros = sorted(furo.diam for furo in furos)
+    tamanho_celula = diametros[len(diametros) // 2]
+    if tamanho_celula <= 0:
+        return []
+    grade = defaultdict(list)
+    celulas = []
+    for i, furo in enumerate(furos):
+        celula = (math.floor(furo.x / tamanho_celula), math.floor(furo.y / tamanho_celula))
+        grade[celula].append(i)
+        celulas.append(celula)
+    pares = []
+    for i, furo in enumerate(furos):
+        cx, cy = celulas[i]
+        # Se dois furos se sobrepõem, a distância entre os centros é menor que o diâmetro do maior
+        alcance = math.ceil(furo.diam / tamanho_celula)
+        if (2 * alcance + 1) ** 2 > len(furos):
+            candidatos = range(len(furos))
+        else:
+            candidatos = (j for dx in range(-alcance, alcance + 1) for dy in range(-alcance, alcance + 1)
+                          for j in grade.get((cx + dx, cy + dy), ()))
+        for j in candidatos:
+            outro = furos[j]
+            # Só o maior furo do par testa (empate decidido pelo índice), então cada par aparece uma vez
+            if (outro.diam, j) < (furo.diam, i) and \
+                    math.hypot(furo.x - outro.x, furo.y - outro.y) < (furo.diam + outro.diam) / 2 - TOLERANCIA_FURO:
+                pares.append((min(i, j), max(i, j)))
+    return sorted(pares)
+
+def problemas_furos(peca):
+    """Lista os problemas dos furos da peça (numerados a partir de 1); vazia se estiver tudo certo."""
+    contorno = peca.contorno()
+    if not peca.furos or contorno is None:
+        return []
+    semiplanos = _semiplanos_internos(contorno[1]) if contorno[0] == 'polyline' else None
+    problemas = []
+    for numero, furo in enumerate(peca.furos, start=1):
+        if furo.diam <= 0:
+            problemas.append(f"furo {numero} com diâmetro inválido")
+        elif not _furo_dentro(contorno, semiplanos, furo):
+            problemas.append(f"furo {numero} (Ø{furo.diam:g} em {furo.x:g}, {furo.y:g}) fora do contorno")
+    validos = [furo for furo in peca.furos if furo.diam > 0]
+    numeros = [numero for numero, furo in enumerate(peca.furos, start=1) if furo.diam > 0]
+    if len(validos) > 1:
+        for i, j in _furos_sobrepostos(validos):
+            problemas.append(f"furos {numeros[i]} e {numeros[j]} sobrepostos")
+    return problemas
+
+def validar_furos(pecas):
+    """
+    Confere os furos de todas as peças ainda válidas. Peças com problema recebem a
+    mensagem em 'erro' (e deixam de gerar DXF). Retorna o relatório no mesmo formato
+    de validar_dataframe, com 'linha' contada a partir de 1 na ordem de 'pecas'.
+    """
+    linhas = []
+    for indice, peca in enumerate(pecas):
+        if peca.erro:
+            continue
+        problemas = problemas_furos(peca)
+        if problemas:
+            excedentes = len(problemas) - MAX_PROBLEMAS_POR_PECA
+            texto = "; ".join(problemas[:MAX_PROBLEMAS_POR_PECA]) + (f" (e mais {excedentes})" if excedentes > 0 else "")
+            peca.erro = f"Furos inválidos: {texto}."
+            linhas.append({'linha': indice + 1, 'nome_arquivo': peca.nome_arquivo, 'erro': peca.erro})
+    return pd.DataFrame(linhas, columns=['linha', 'nome_arquivo', 'erro'])
+
+def salvar_relatorio(relatorio, caminho):
+    """
+    Grava o relatório de erros de validação em JSON. Sem erros, remove o arquivo de
+    uma execução anterior para que ele nunca descreva um lote que já foi corrigido.
+    """
+    if relatorio.empty:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        return False
+    registros = [{'linha': int(linha), 'nome_arquivo': nome, 'erro': erro}
+                 for linha, nome, erro in relatorio[['linha', 'nome_arquivo', 'erro']].itertuples(index=False)]
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(registros, f, indent=4, ensure_ascii=False)
+    return True